@@ -0,0 +1,143 @@
+"""
+Vectorized scoring of many hands at once
+
+Hands are rows of an (N x 56) count matrix, using the card ids of
+Card.index. A hand of at most MAX_VECTOR_HAND = 5 cards can hold only one
+meld, so its best score is found with array operations over every book
+and run at once.
+
+Vectorization stops there. Larger hands can split into several melds and
+are scored one row at a time by the exact MeldSolver, through
+scoring.score_indices so they share SCORE_CACHE with score_hand, and with
+one solver per batch so rows reuse each other's subproblems.
+"""
+
+import numpy as np
+
+from meld_index import get_index
+from deck import JOKER_INDEX, MIN_RANK, NUM_RANKS
+from meld_solver import MeldSolver
+from scoring import score_indices
+
+NUM_SUITS = 5
+JOKER_VALUE = 50
+MAX_VECTOR_HAND = 5
+
+_RANK_VALUES = np.arange(NUM_RANKS) + MIN_RANK
+_RUN_PATTERNS = {}
+
+# Bit of each card index, for subset tests on whole hands
+_CARD_BITS = np.left_shift(np.uint64(1), np.arange(JOKER_INDEX + 1, dtype=np.uint64))
+
+
+def card_values(epoch, keep_wild=False):
+    """
+    Get score value of every card index, matching Game.card_value
+
+    Args:
+        epoch (int): Epoch number
+        keep_wild (bool): Score wild cards as 0
+
+    Returns:
+        np.ndarray: Length 56 array of card values
+    """
+    values = np.append(np.tile(_RANK_VALUES, NUM_SUITS), JOKER_VALUE)
+    if keep_wild:
+        values[list(get_index(epoch).is_wild)] = 0
+    return values
+
+
+def score_batch(counts, epoch, keep_wild=False):
+    """
+    Get lowest score of every hand in a batch
+
+    Args:
+        counts (np.ndarray): (N x 56) count of each card in each hand
+        epoch (int): Epoch number
+        keep_wild (bool): Score wild cards as 0
+
+    Returns:
+        np.ndarray: Length N array of lowest possible scores
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    index = get_index(epoch)
+    values = card_values(epoch, keep_wild)
+    wild_rank = epoch - MIN_RANK
+
+    # Split hands into non-wild counts and wild counts
+    wild_mask = np.array(index.is_wild)
+    natural_counts = np.where(wild_mask, 0, counts)
+    naturals = natural_counts[:, :JOKER_INDEX].reshape(-1, NUM_SUITS, NUM_RANKS)
+    jokers = counts[:, JOKER_INDEX]
+    rank_wilds = counts[:, wild_rank : JOKER_INDEX : NUM_RANKS].sum(axis=1)
+    wilds = jokers + rank_wilds
+    joker_value = values[JOKER_INDEX]
+    rank_wild_value = values[wild_rank]
+    wild_total = jokers * joker_value + rank_wilds * rank_wild_value
+
+    # Books: every copy of one rank plus every wild card
+    rank_counts = naturals.sum(axis=1)
+    book_ok = (rank_counts >= 1) & (rank_counts + wilds[:, None] >= 3)
+    book_cover = rank_counts * _RANK_VALUES + wild_total[:, None]
+    best_cover = np.where(book_ok, book_cover, 0).max(axis=1)
+
+    # Runs: every indexed run small enough to fit in the hand
+    hand_sizes = counts.sum(axis=1)
+    max_cards = int(min(hand_sizes.max(initial=0), MAX_VECTOR_HAND))
+    run_masks, run_values, group_starts, group_wilds = _run_patterns(
+        index, values, max_cards
+    )
+    if len(run_masks):
+        hand_masks = (natural_counts > 0) @ _CARD_BITS
+        fits = (run_masks & ~hand_masks[:, None]) == 0
+        fit_values = np.where(fits, run_values, -1)
+
+        # Best fitting run for each number of wild cards it needs
+        group_best = np.maximum.reduceat(fit_values, group_starts, axis=1)
+        group_ok = (group_best >= 0) & (group_wilds <= wilds[:, None])
+
+        # Most valuable wild cards go into the gaps first
+        joker_gaps = np.minimum(group_wilds, jokers[:, None])
+        gap_value = joker_gaps * joker_value + (group_wilds - joker_gaps) * rank_wild_value
+        run_cover = np.where(group_ok, group_best + gap_value, 0)
+        best_cover = np.maximum(best_cover, run_cover.max(axis=1))
+
+    scores = counts @ values - best_cover
+
+    # Two or more melds can fit: use the exact solver
+    large = np.flatnonzero(hand_sizes > MAX_VECTOR_HAND)
+    if len(large):
+        solver = MeldSolver(index)
+        card_ids = np.arange(JOKER_INDEX + 1)
+        for row in large:
+            hand = np.repeat(card_ids, counts[row]).tolist()
+            scores[row] = score_indices(hand, epoch, keep_wild, solver)
+
+    return scores
+
+
+def _run_patterns(index, values, max_cards=MAX_VECTOR_HAND):
+    """
+    Get card bitmask and non-wild card value of every run with at most
+    max_cards cards, grouped by the number of wild cards each needs.
+    Built once per epoch and hand size.
+    """
+    patterns = _RUN_PATTERNS.get((index.epoch, max_cards))
+    if patterns is None:
+        runs = sorted(
+            (min_wilds, naturals)
+            for naturals, (min_wilds, max_wilds) in index.melds.items()
+            if max_wilds is not None and len(naturals) + min_wilds <= max_cards
+        )
+        run_masks = np.array(
+            [_CARD_BITS[list(naturals)].sum() for _, naturals in runs],
+            dtype=np.uint64,
+        )
+        run_values = np.array(
+            [values[list(naturals)].sum() for _, naturals in runs], dtype=np.int64
+        )
+        run_wilds = np.array([w for w, _ in runs], dtype=np.int64)
+        group_wilds, group_starts = np.unique(run_wilds, return_index=True)
+        patterns = (run_masks, run_values, group_starts, group_wilds)
+        _RUN_PATTERNS[index.epoch, max_cards] = patterns
+    return patterns
@@ -0,0 +1,212 @@
+"""
+Search budgets: when one MCTS search stops, and how a game's time is
+spread across a player's decisions
+"""
+
+import time
+
+HORIZON = 8
+MIN_SHARE = 0.05
+
+
+class SearchBudget:
+    """
+    Stops a search on an iteration count, process CPU time, or once the
+    most visited root action can no longer be overtaken. With early_stop,
+    searches must return that most visited action, which rank() orders
+    first.
+
+    Attributes:
+        cpu_time (float): Seconds of process CPU time, None for no limit
+        iterations (int): Number of iterations, None for no limit
+        early_stop (bool): Stop when the root decision is settled
+        stopped_early (bool): Whether the last search stopped early
+
+    Methods:
+        start(): Start timing a search
+        elapsed(): CPU seconds since start
+        should_stop(iters, visits): Check if the search should stop
+        rank(n, r): Sort key of a root action, higher is better
+    """
+
+    def __init__(self, cpu_time=None, iterations=None, early_stop=False,
+                 clock=time.process_time):
+        if cpu_time is None and iterations is None:
+            raise ValueError("Search budget needs cpu_time or iterations")
+        self.cpu_time = cpu_time
+        self.iterations = iterations
+        self.early_stop = early_stop
+        self.stopped_early = False
+        self._clock = clock
+        self._start = None
+
+    def start(self):
+        """
+        Start timing a search
+        """
+        self._start = self._clock()
+        self.stopped_early = False
+
+    def elapsed(self):
+        """
+        Get CPU seconds since start
+
+        Returns:
+            float: Seconds used
+        """
+        return self._clock() - self._start
+
+    def should_stop(self, iters, visits):
+        """
+        Check if the search should stop
+
+        Args:
+            iters (int): Iterations run so far
+            visits (list): Visit count of every root action, 0 for
+                actions not yet expanded
+
+        Returns:
+            bool: True if the search should stop
+        """
+        if iters == 0:
+            return False
+        remaining = float("inf")
+        if self.iterations is not None:
+            remaining = self.iterations - iters
+        if self.cpu_time is not None:
+            elapsed = self.elapsed()
+            if elapsed >= self.cpu_time:
+                return True
+            rate = iters / elapsed if elapsed > 0 else float("inf")
+            remaining = min(remaining, rate * (self.cpu_time - elapsed))
+        if remaining <= 0:
+            return True
+
+        # Runner-up cannot catch up even if it gets every iteration left
+        if self.early_stop:
+            if len(visits) < 2:
+                self.stopped_early = True
+                return True
+            first, second = sorted(visits, reverse=True)[:2]
+            if first - second > remaining:
+                self.stopped_early = True
+                return True
+        return False
+
+    def rank(self, n, r):
+        """
+        Get sort key of a root action, higher is better
+
+        With early_stop this is visits, then average reward, so the action
+        chosen is the one should_stop waited to settle. Otherwise it is the
+        average reward.
+
+        Args:
+            n (int): Visits of the action
+            r (float): Total reward of the action
+
+        Returns:
+            tuple: Sort key
+        """
+        if self.early_stop:
+            return (n, r / n)
+        return (r / n,)
+
+
+class TimeBank:
+    """
+    CPU time for one game, spread across a player's decisions
+
+    With no total, every decision gets per_move seconds.
+
+    Attributes:
+        total (float): Seconds for the whole game, None for a fixed budget
+        per_move (float): Seconds per decision when total is None
+        allotted (float): Seconds handed out so far
+        spent (float): Seconds actually used so far
+        decisions (int): Number of decisions made
+
+    Methods:
+        allocate(game): Seconds for the next decision
+        count_decision(): Count a decision searched without the bank
+        spend(seconds): Record time used by a decision
+        saved(): Seconds handed out but not used
+        stats(): Return counters
+    """
+
+    def __init__(self, total=None, per_move=1.0, horizon=HORIZON,
+                 min_share=MIN_SHARE):
+        self.total = total
+        self.per_move = per_move
+        self.horizon = horizon
+        self.min_share = min_share
+        self.allotted = 0.0
+        self.spent = 0.0
+        self.decisions = 0
+
+    def allocate(self, game):
+        """
+        Get seconds for the next decision
+
+        Once a player has gone out this is the last decision, so it gets
+        everything left. Otherwise the bank is split over the turns the
+        deck can still last, up to horizon turns.
+
+        Args:
+            game (Game): Game object
+
+        Returns:
+            float: Seconds for the decision
+        """
+        if self.total is None:
+            seconds = self.per_move
+        else:
+            left = max(0.0, self.total - self.spent)
+            if game.is_going_out():
+                turns = 1
+            else:
+                turns = game.get_deck().size() // game.num_players()
+                turns = max(1, min(self.horizon, turns))
+            seconds = max(left / turns, self.min_share)
+        self.allotted += seconds
+        self.count_decision()
+        return seconds
+
+    def count_decision(self):
+        """
+        Count a decision, for searches given a fixed iteration budget
+        rather than seconds from allocate
+        """
+        self.decisions += 1
+
+    def spend(self, seconds):
+        """
+        Record time used by a decision
+
+        Args:
+            seconds (float): Seconds used
+        """
+        self.spent += seconds
+
+    def saved(self):
+        """
+        Get seconds handed out but not used, because searches stopped early
+
+        Returns:
+            float: Seconds saved
+        """
+        return max(0.0, self.allotted - self.spent)
+
+    def stats(self):
+        """
+        Return counters
+
+        Returns:
+            dict: Decisions, seconds allotted, spent and saved
+        """
+        return dict(
+            decisions=self.decisions,
+            allotted=self.allotted,
+            spent=self.spent,
+            saved=self.saved(),
+        )
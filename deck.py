@@ -2,23 +2,91 @@
 Creates Card and Deck classes for card games
 """
 
+import copy
 import random
 import itertools as it
 
 
+# Compact card ids: 11 * suit + rank - 3 for standard cards, 55 for jokers
+CARD_SUITS = ("Clubs", "Diamonds", "Hearts", "Spades", "Stars")
+MIN_RANK = 3
+NUM_RANKS = 11
+JOKER_INDEX = NUM_RANKS * len(CARD_SUITS)
+NUM_CARD_IDS = JOKER_INDEX + 1
+
+_SUIT_INDEX = {suit: i for i, suit in enumerate(CARD_SUITS)}
+
+
+def card_id(rank, suit):
+    """
+    Return compact id of card with given rank and suit
+
+    Args:
+        rank (int): Rank of card
+        suit (str): Suit of card
+
+    Returns:
+        int: Card id, from 0 to 55 for five crowns cards
+    """
+    return Card(rank, suit).index()
+
+
+def card_from_id(idx):
+    """
+    Return the interned card with given id
+
+    Args:
+        idx (int): Card id
+
+    Returns:
+        Card: Card with that id
+    """
+    if idx < len(Card._by_id) and Card._by_id[idx] is not None:
+        return Card._by_id[idx]
+    if idx == JOKER_INDEX:
+        return Card(50, "J")
+    suit, rank = divmod(idx, NUM_RANKS)
+    return Card(rank + MIN_RANK, CARD_SUITS[suit])
+
+
 class Card:
     """
     Represents a card of given rank and suit
 
+    Cards are interned: every Card(rank, suit) call returns the same
+    object, so hashing, equality and copying are essentially free.
+
     Methods:
         rank(): Return rank of card
         suit(): Return suit of card
+        index(): Return compact id of card
     """
 
-    def __init__(self, rank, suit):
-        self._rank = rank
-        self._suit = suit
-        self._hash = str(self).__hash__()
+    __slots__ = ("_rank", "_suit", "_id")
+
+    _interned = {}
+    _by_id = [None] * NUM_CARD_IDS
+
+    def __new__(cls, rank, suit):
+        card = cls._interned.get((rank, suit))
+        if card is not None:
+            return card
+
+        card = super().__new__(cls)
+        card._rank = rank
+        card._suit = suit
+        if suit == "J":
+            card._id = JOKER_INDEX
+        elif suit in _SUIT_INDEX and MIN_RANK <= rank < MIN_RANK + NUM_RANKS:
+            card._id = NUM_RANKS * _SUIT_INDEX[suit] + rank - MIN_RANK
+        else:
+            # Cards outside the five crowns deck get the next free id
+            card._id = max(NUM_CARD_IDS, len(cls._by_id))
+            cls._by_id.extend([None] * (card._id + 1 - len(cls._by_id)))
+        if cls._by_id[card._id] is None:
+            cls._by_id[card._id] = card
+        cls._interned[(rank, suit)] = card
+        return card
 
     def rank(self):
         """
@@ -38,6 +106,16 @@ class Card:
         """
         return self._suit
 
+    def index(self):
+        """
+        Return compact id of card
+
+        Returns:
+            int: Card id, same as dqn_infer.card_to_idx except for
+                jokers, which DQN model inputs put at 52
+        """
+        return self._id
+
     def __repr__(self):
         # For printing
         return str(self._rank) + str(self._suit)
@@ -50,22 +128,55 @@ class Card:
 
     def __hash__(self):
         # For using a hash key
-        return self._hash
+        return self._id
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # Re-intern when unpickled in another process
+        return (Card, (self._rank, self._suit))
+
+
+def make_rng(seed=None, stream=0):
+    """
+    Return random number generator for one stream of a seed
+
+    Streams of the same seed are independent, so each game or worker can
+    take its own stream and still be reproduced from the one seed.
+
+    Args:
+        seed (int): Base seed, or None for a fresh random seed
+        stream: Stream id, such as a game number
+
+    Returns:
+        random.Random: Random number generator
+    """
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}/{stream}")
 
 
 class Deck:
     """
     Represents a one-time use deck of cards
 
+    Cards are kept in a list used as a stack, so dealing pops from the
+    end in O(1) per card. Each deck owns its random number generator
+    instead of using the global random module.
+
     Methods:
         shuffle(): Shuffle deck
         size(): Return number of remaining cards
         deal(n): Remove and return next n cards
         get_cards(): Get set of cards
-        draw(): Draw one card from deck
+        put_back(card): Return card to top of deck
     """
 
-    def __init__(self, ranks, suits, jokers, copies):
+    def __init__(self, ranks, suits, jokers, copies, rng=None):
         """
         Create a deck of cards for the given ranks and suits, with
         given number of jokers, and makes a certain number of copies
@@ -77,7 +188,9 @@ class Deck:
         suits -- iterable
         jokers -- nonnegatie integer
         copies -- nonnegative integer
+        rng -- random.Random to shuffle with, fresh one if None
         """
+        self._rng = rng if rng is not None else random.Random()
         self._cards = []
         for _ in range(copies):
             self._cards.extend(map(lambda c: Card(*c), it.product(ranks, suits)))
@@ -87,7 +200,7 @@ class Deck:
         """
         Shuffles deck
         """
-        random.shuffle(self._cards)
+        self._rng.shuffle(self._cards)
 
     def size(self):
         """
@@ -105,10 +218,8 @@ class Deck:
         Returns:
             list: List of n cards
         """
-        dealt = self._cards[-n:]
-        dealt.reverse()
-        del self._cards[-n:]
-        return dealt
+        cards = self._cards
+        return [cards.pop() for _ in range(n)]
 
     def get_cards(self):
         """
@@ -119,14 +230,16 @@ class Deck:
         """
         return self._cards
 
-    def draw(self):
+    def put_back(self, card):
         """
-        Draw one card from deck
-
-        Returns:
-            Card: Card drawn
+        Return card to top of deck, undoing deal(1)
         """
-        if self.size() > 0:
-            card = random.choice(self._cards)
-            self._cards.remove(card)
-            return card
+        self._cards.append(card)
+
+    def __deepcopy__(self, memo):
+        # Cards are interned, so only the list and generator state are copied
+        deck = Deck.__new__(Deck)
+        memo[id(self)] = deck
+        deck._rng = copy.deepcopy(self._rng, memo)
+        deck._cards = self._cards[:]
+        return deck
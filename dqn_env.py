@@ -0,0 +1,141 @@
+"""
+Batched training environment for the DQN discard policy
+
+Player 0 is the agent and players 1 to N - 1 are greedy opponents that
+play inside the environment. The agent draws like DQNPlayer, so the only
+action is the card to discard. Observations use the encode_state layout:
+count of each card in hand, one-hot of the card just taken from the
+discard pile, and Go out status.
+
+Model inputs index cards by INPUT_INDEX rather than Card.index: the
+shipped models were trained with jokers at input 52, shared with the
+Jack of Stars. Outputs are Q values by card id, with jokers at 55 as
+DQNPlayer has always read them.
+"""
+
+import numpy as np
+
+from deck import JOKER_INDEX, NUM_CARD_IDS
+from batch_scoring import score_batch
+from vector_sim import VectorGames, hand_counts
+
+STATE_DIM = 2 * NUM_CARD_IDS + 1
+ACTION_DIM = NUM_CARD_IDS
+INPUT_JOKER_INDEX = 52
+# Model input index of each card id
+INPUT_INDEX = np.arange(NUM_CARD_IDS)
+INPUT_INDEX[JOKER_INDEX] = INPUT_JOKER_INDEX
+AGENT = 0
+
+
+class VectorEnv:
+    """
+    N concurrent games with a reset()/step(actions) API
+
+    Attributes:
+        num_envs (int): Number of concurrent games
+        num_players (int): Number of players in each game
+        epoch (int): Epoch number
+        games (VectorGames): Games being played
+
+    Methods:
+        reset(seed): Start N new games
+        step(actions): Discard for the agent and play until its next turn
+        action_mask(): Legal discards for the agent
+    """
+
+    def __init__(self, num_envs, num_players=4, epoch=3):
+        self.num_envs = num_envs
+        self.num_players = num_players
+        self.epoch = epoch
+        self.games = None
+        self._obs = np.zeros((num_envs, STATE_DIM), dtype=np.float32)
+        self._rewards = np.zeros(num_envs, dtype=np.float32)
+        self._dones = np.zeros(num_envs, dtype=bool)
+        self._streams = 0
+
+    def reset(self, seed=None):
+        """
+        Start N new games and draw the agent's first card
+
+        Args:
+            seed (int): Base seed, games use streams that continue across
+                resets so no two episodes repeat a deal
+
+        Returns:
+            np.ndarray: (N x 113) observations
+        """
+        streams = range(self._streams, self._streams + self.num_envs)
+        self._streams += self.num_envs
+        policies = ["external"] + ["greedy"] * (self.num_players - 1)
+        self.games = VectorGames(
+            self.num_envs, policies, epoch=self.epoch, seed=seed, streams=streams
+        )
+        self._dones[:] = False
+        self.games.draw()
+        self._encode()
+        return self._obs
+
+    def step(self, actions):
+        """
+        Discard actions[i] in every live game, let the greedy opponents
+        play, and draw the agent's next card
+
+        Games that are already done ignore their action and return a
+        reward of 0.
+
+        Args:
+            actions (np.ndarray): Card id to discard in each game
+
+        Returns:
+            tuple: (N x 113) observations, rewards, dones. The arrays are
+                reused by the next call.
+        """
+        games = self.games
+        was_done = self._dones.copy()
+        games.discard(actions)
+        while games.active_player() != AGENT and games.step():
+            pass
+        games.draw()
+
+        self._dones[:] = games.game_over
+        ended = np.flatnonzero(self._dones & ~was_done)
+        self._rewards[:] = 0
+        self._rewards[ended] = self._payoff(ended)
+        self._encode()
+        return self._obs, self._rewards, self._dones
+
+    def action_mask(self):
+        """
+        Get legal discards for the agent in every game
+
+        Returns:
+            np.ndarray: (N x 56) boolean mask, all False for finished games
+        """
+        return self.games.legal_discards()
+
+    def _payoff(self, ended):
+        """
+        1 if the agent's hand scores 0 after someone went out, -1 if it
+        does not, and 0 if the deck ran out
+        """
+        games = self.games
+        hands = games.hands[ended, AGENT, : self.epoch]
+        scores = score_batch(hand_counts(hands), self.epoch)
+        return np.where(games.go_out[ended], np.where(scores == 0, 1, -1), 0)
+
+    def _encode(self):
+        """
+        Write the agent's encoded state into the observation buffer
+        """
+        games = self.games
+        obs = self._obs
+        obs[:] = 0
+        live = np.flatnonzero(~games.game_over)
+        obs[live, :NUM_CARD_IDS] = hand_counts(games.hands[live, AGENT])
+        obs[:, INPUT_JOKER_INDEX] += obs[:, JOKER_INDEX]
+        obs[:, JOKER_INDEX] = 0
+        taken = games.prev_discard[live]
+        took = taken >= 0
+        obs[live[took], NUM_CARD_IDS + INPUT_INDEX[taken[took]]] = 1
+        obs[:, -1] = games.go_out
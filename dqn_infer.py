@@ -1,80 +1,90 @@
-import torch
 import numpy as np
-from deck import Card
-from dqn import DQN
+from deck import NUM_CARD_IDS, card_id, card_from_id
+from dqn_env import INPUT_INDEX, STATE_DIM
+from dqn_numpy import NumpyDQN
 
+_INPUT_INDEX = INPUT_INDEX.tolist()
+
+# Reused by every inference call in the process. A torch model reads it
+# through a tensor that shares its memory, made on first use.
+_STATE = np.zeros(STATE_DIM, dtype=np.float32)
+_STATE_TENSOR = []
 
-def card_to_idx(suit, rank):
-    suit_dict = {
-        'Clubs': 0,
-        'Diamonds': 1,
-        'Hearts': 2,
-        'Spades': 3,
-        'Stars': 4,
-        'J': 5
-    }
 
-    return 11 * suit_dict[suit] + (rank if suit != "J" else 0) - 3
+def card_to_idx(suit, rank):
+    return _INPUT_INDEX[card_id(rank, suit)]
 
 
 def idx_to_card(idx):
-    suit_dict = {
-        0: 'Clubs',
-        1: 'Diamonds',
-        2: 'Hearts',
-        3: 'Spades',
-        4: 'Stars',
-        5: 'J'
-    }
+    return card_from_id(idx)
+
+
+def encode_state_into(out, hand, discard_card, gone_out_status):
+    """
+    Write the encoded state into out without allocating
 
-    suit = suit_dict[idx // 11]
-    if suit == "J":
-        rank = 50
-    else:
-        rank = (idx % 11) + 3
+    Layout: count of each card in hand, one-hot of the card taken from
+    the discard pile, and Go out status, with cards at their INPUT_INDEX.
 
-    return Card(rank, suit)
+    Args:
+        out (np.ndarray): Array of STATE_DIM values to overwrite
+        hand (list): List of cards in hand
+        discard_card (Card): Card taken from discard pile, None if drawn
+        gone_out_status (bool): Whether a player has gone out
+
+    Returns:
+        np.ndarray: out
+    """
+    out.fill(0)
+    for card in hand:
+        out[_INPUT_INDEX[card.index()]] += 1
+    if discard_card is not None:
+        out[NUM_CARD_IDS + _INPUT_INDEX[discard_card.index()]] = 1
+    out[-1] = gone_out_status
+    return out
 
 
 def encode_state(num_players, full_deck, player_deck, discard_card, gone_out_status):
-    num_players = num_players
+    return encode_state_into(
+        np.zeros(STATE_DIM), player_deck, discard_card, gone_out_status
+    )
 
-    deck = set(full_deck)
 
-    encoded_deck = np.zeros(len(deck))
-    for idx, card in enumerate(player_deck):
-        card_idx = card_to_idx(card.suit(), card.rank())
-        encoded_deck[card_idx] += 1
+def best_discard(q_values, hand, discard_card):
+    """
+    Card in hand with the highest Q value, never the card just taken from
+    the discard pile. Ties go to the lowest card id.
 
-    # Encode discard card as (rank, suit)
-    discard_card_encoded = np.zeros(len(deck))
-    if discard_card is not None:
-        discard_idx = card_to_idx(discard_card.suit(), discard_card.rank())
-        discard_card_encoded[discard_idx] = 1
+    Args:
+        q_values (np.ndarray): Q value of each card id
+        hand (list): List of cards in hand
+        discard_card (Card): Card taken from discard pile, None if drawn
 
-    # Gone out status
-    gone_out_status_encoded = int(gone_out_status)
+    Returns:
+        Card: Card to discard, None if there is none
+    """
+    ids = sorted({card.index() for card in hand if card != discard_card})
+    if not ids:
+        return None
+    return card_from_id(ids[int(np.argmax(q_values[ids]))])
 
-    return np.concatenate([
-        encoded_deck,
-        discard_card_encoded,
-        [gone_out_status_encoded]
-    ])
 
+def _forward(policy_net):
+    """
+    Q values for the state in the shared buffer
+    """
+    if isinstance(policy_net, NumpyDQN):
+        return policy_net(_STATE)
 
-def inference(game, hand, discard_card, policy_net):
-    encoded_state = encode_state(game.num_players(
-    ), game.get_full_deck()._cards, hand, discard_card, game._go_out)
+    import torch
 
+    if not _STATE_TENSOR:
+        _STATE_TENSOR.append(torch.from_numpy(_STATE))
     with torch.no_grad():
-        device = torch.device("mps" if torch.backends.mps.is_available(
-        ) else "cuda" if torch.cuda.is_available() else "cpu")
-        output = policy_net(torch.Tensor(
-            encoded_state).to(device)).to("cpu").numpy()
+        device = next(policy_net.parameters()).device
+        return policy_net(_STATE_TENSOR[0].to(device)).to("cpu").numpy()
 
-        sorted_list = [(output[i], idx_to_card(i)) for i in range(len(output))]
-        sorted_list.sort(key=lambda x: x[0], reverse=True)
 
-        for _, card in sorted_list:
-            if card in hand and card != discard_card:
-                return card
+def inference(game, hand, discard_card, policy_net):
+    encode_state_into(_STATE, hand, discard_card, game.is_going_out())
+    return best_discard(_forward(policy_net), hand, discard_card)
@@ -0,0 +1,110 @@
+"""
+Torch-free forward pass of the DQN, from weights exported to .npz
+
+Run this module to export the .pth checkpoints, which needs torch once:
+
+    python dqn_numpy.py 3 4 5
+"""
+
+import sys
+
+import numpy as np
+
+CHECKPOINT = "five_crowns_dqn_{epoch}.pth"
+WEIGHTS = "five_crowns_dqn_{epoch}.npz"
+
+# Linear layers of DQN.fc, in order
+LAYERS = ("fc.0", "fc.2", "fc.4")
+
+
+class NumpyDQN:
+    """
+    NumPy copy of DQN for inference
+
+    Attributes:
+        weights (list): (weight, bias) float32 arrays of each linear layer
+
+    Methods:
+        from_state_dict(state_dict): Build from a state dict of arrays
+        load(path): Load weights from an exported .npz file
+        forward(x): Forward pass
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        """
+        Build from a DQN state dict of NumPy arrays
+
+        Args:
+            state_dict (dict): Parameter name mapped to array
+
+        Returns:
+            NumpyDQN: Network with the given weights
+        """
+        weights = [
+            (
+                np.ascontiguousarray(state_dict[f"{layer}.weight"].T, dtype=np.float32),
+                np.asarray(state_dict[f"{layer}.bias"], dtype=np.float32),
+            )
+            for layer in LAYERS
+        ]
+        return cls(weights)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load weights from an exported .npz file
+
+        Args:
+            path (str): Path to the .npz file
+
+        Returns:
+            NumpyDQN: Network with the file's weights
+        """
+        with np.load(path) as data:
+            return cls.from_state_dict(dict(data))
+
+    def forward(self, x):
+        """
+        Forward pass, with ReLU between the linear layers
+
+        Args:
+            x (np.ndarray): Encoded state, or a batch of them
+
+        Returns:
+            np.ndarray: Q value of each card id
+        """
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(self.weights):
+            x = x @ weight + bias
+            if i < last:
+                np.maximum(x, 0, out=x)
+        return x
+
+    __call__ = forward
+
+
+def export(epoch):
+    """
+    Export the weights of a .pth checkpoint to .npz
+
+    Args:
+        epoch (int): Epoch number
+
+    Returns:
+        str: Path of the .npz file
+    """
+    import torch
+
+    state_dict = torch.load(CHECKPOINT.format(epoch=epoch), map_location="cpu")
+    path = WEIGHTS.format(epoch=epoch)
+    np.savez(path, **{key: value.numpy() for key, value in state_dict.items()})
+    return path
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        print(export(int(arg)))
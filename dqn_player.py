@@ -1,11 +1,9 @@
-import copy
-import torch
-
-from dqn import DQN
 from player import Player
 from scoring import get_best_discard
+from draw_eval import expected_draw_score
 from constants import GET_DISCARD, DRAW_CARD
 from dqn_infer import inference
+from dqn_registry import get_model
 
 
 class DQNPlayer(Player):
@@ -28,33 +26,17 @@ class DQNPlayer(Player):
             temp_hand, game, excluded_discard=new_card)
 
         # Get best expected score if we draw random
-        remaining_deck = copy.deepcopy(game.get_full_deck().get_cards())
-        draw_scores = []
-        for card in game.get_discard_pile() + self.hand:
-            remaining_deck.remove(card)
-        for card in remaining_deck:
-            temp_hand = self.hand + [card]
-            _, draw_score = get_best_discard(temp_hand, game)
-            draw_scores.append(draw_score)
-        expected_draw_score = sum(draw_scores)/len(draw_scores)
+        draw_score = expected_draw_score(
+            self.hand, game, game.get_unseen_cards(self.player_id))
 
         # Take action with better expected score
-        if discard_score < expected_draw_score:
+        if discard_score < draw_score:
             self.prev_discard = game.get_discard_pile()[-1]
             return GET_DISCARD
         self.prev_discard = None
         return DRAW_CARD
 
     def discard_phase(self, game):
-        if not self.policy_net:
-            device = torch.device("mps" if torch.backends.mps.is_available(
-            ) else "cuda" if torch.cuda.is_available() else "cpu")
-            self.policy_net = DQN(113, 56).to(device)
-            self.policy_net.load_state_dict(
-                torch.load(f'five_crowns_dqn_{game.get_epoch()}.pth'))
-            self.policy_net.eval()
-        with torch.no_grad():
-            action = inference(
-                game, self.hand, self.prev_discard, self.policy_net)
-
-        return action
+        if self.policy_net is None:
+            self.policy_net = get_model(game.get_epoch())
+        return inference(game, self.hand, self.prev_discard, self.policy_net)
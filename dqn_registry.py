@@ -0,0 +1,127 @@
+"""
+Process-wide registry of trained DQN models, one per epoch
+
+Every DQNPlayer in a process shares the same network. Exported .npz
+weights run on NumPy without importing torch, and the .pth checkpoint is
+only loaded when no export exists. Models preloaded before a pool forks
+its workers are inherited by them, so the weights are shared
+copy-on-write instead of loaded again in each worker.
+"""
+
+import os
+import sys
+import resource
+
+from dqn_env import ACTION_DIM, STATE_DIM
+from dqn_numpy import CHECKPOINT, WEIGHTS, NumpyDQN
+
+_MODELS = {}
+_LOADS = {}
+
+
+def get_device():
+    """
+    Get the device torch models are loaded on
+
+    Returns:
+        torch.device: mps or cuda if available, else cpu
+    """
+    import torch
+
+    return torch.device("mps" if torch.backends.mps.is_available(
+    ) else "cuda" if torch.cuda.is_available() else "cpu")
+
+
+def _load_torch(epoch):
+    """
+    Load the .pth checkpoint for epoch as an eval mode DQN
+    """
+    import torch
+    from dqn import DQN
+
+    device = get_device()
+    model = DQN(STATE_DIM, ACTION_DIM).to(device)
+    model.load_state_dict(
+        torch.load(CHECKPOINT.format(epoch=epoch), map_location=device))
+    model.eval()
+    model.requires_grad_(False)
+    return model
+
+
+def get_model(epoch):
+    """
+    Get the trained network for epoch, loading it on first use
+
+    Args:
+        epoch (int): Epoch number
+
+    Returns:
+        NumpyDQN or DQN: Shared network, NumpyDQN if the weights have
+            been exported
+    """
+    model = _MODELS.get(epoch)
+    if model is None:
+        path = WEIGHTS.format(epoch=epoch)
+        if os.path.exists(path):
+            model = NumpyDQN.load(path)
+        else:
+            model = _load_torch(epoch)
+        _MODELS[epoch] = model
+        _LOADS[epoch] = _LOADS.get(epoch, 0) + 1
+    return model
+
+
+def preload(epochs):
+    """
+    Load the networks for epochs now, before worker processes are forked
+
+    Torch models are skipped when they would run on cuda or mps, which
+    cannot be used again in a forked worker.
+
+    Args:
+        epochs (iterable): Epoch numbers
+    """
+    for epoch in epochs:
+        if os.path.exists(WEIGHTS.format(epoch=epoch)) or get_device().type == "cpu":
+            get_model(epoch)
+
+
+def clear():
+    """
+    Drop every loaded model, so the next get_model loads from disk
+    """
+    _MODELS.clear()
+
+
+def rss_bytes():
+    """
+    Get resident memory of this process
+
+    Returns:
+        int: Current resident bytes, or peak resident bytes where the
+            current value cannot be read
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def stats():
+    """
+    Return registry counters for this process
+
+    Returns:
+        dict: Process ID, loaded epochs, loads from disk per epoch and
+            resident bytes
+    """
+    return dict(
+        pid=os.getpid(),
+        loaded=sorted(_MODELS),
+        loads=dict(_LOADS),
+        rss=rss_bytes(),
+    )
@@ -0,0 +1,333 @@
+"""
+Parallel self-play DQN training
+
+Actor processes play batches of games against greedy opponents in a
+VectorEnv, choosing discards epsilon-greedily with a NumPy copy of the
+policy network. They stream transitions to the learner, which trains the
+torch network and sends its weights back every SYNC_EVERY updates.
+
+    python dqn_train.py --epoch 3 --actors 4 --updates 20000
+
+With --prioritized the learner replays transitions by TD error, and with
+--replay-path its buffer lives in memory-mapped files that a restarted run
+picks up again.
+
+The result is saved as five_crowns_dqn_{epoch}.pth, and exported to .npz
+for DQNPlayer.
+"""
+
+import argparse
+import multiprocessing as mp
+import queue
+import time
+
+import numpy as np
+
+from dqn_env import ACTION_DIM, STATE_DIM, VectorEnv
+from dqn_numpy import CHECKPOINT, NumpyDQN, export
+from replay import BETA, ReplayBuffer
+
+PLAYERS = 4
+BATCH_SIZE = 64
+GAMMA = 0.99
+LEARNING_RATE = 1e-4
+BUFFER_SIZE = 10000
+TARGET_UPDATE = 500
+SYNC_EVERY = 100
+MIN_EPSILON = 0.1
+EPSILON_DECAY = 0.995
+
+
+def choose_actions(net, obs, mask, epsilon, rng):
+    """
+    Epsilon-greedy discards for a batch of games
+
+    Args:
+        net (NumpyDQN): Policy network
+        obs (np.ndarray): (N x 113) observations
+        mask (np.ndarray): (N x 56) legal discards
+        epsilon (float): Chance of a random legal discard
+        rng (np.random.Generator): Random generator
+
+    Returns:
+        np.ndarray: Card id to discard in each game
+    """
+    greedy = np.where(mask, net(obs), -np.inf).argmax(axis=1)
+    random_legal = (rng.random(mask.shape) * mask).argmax(axis=1)
+    explore = rng.random(len(obs)) < epsilon
+    return np.where(explore, random_legal, greedy)
+
+
+def actor(actor_id, epoch, num_envs, seed, weights, transitions, stop, counters):
+    """
+    Play games and stream transitions until stop is set
+
+    Args:
+        actor_id (int): Actor number
+        epoch (int): Epoch number
+        num_envs (int): Games played at once
+        seed (int): Base seed, actor k plays seed (seed, k)
+        weights (mp.Queue): Latest policy state dict from the learner
+        transitions (mp.Queue): (states, actions, rewards, next states,
+            dones) arrays sent to the learner
+        stop (mp.Event): Set by the learner when training is over
+        counters (mp.Array): Games finished by each actor
+    """
+    # Transitions still queued when the learner stops can be dropped
+    transitions.cancel_join_thread()
+    env_seed = None if seed is None else (seed, actor_id)
+    rng = np.random.default_rng(None if seed is None else [seed, actor_id])
+    env = VectorEnv(num_envs, PLAYERS, epoch)
+    net = NumpyDQN.from_state_dict(weights.get())
+    games = 0
+
+    obs = env.reset(env_seed)
+    dones = np.zeros(num_envs, dtype=bool)
+    while not stop.is_set():
+        try:
+            net = NumpyDQN.from_state_dict(weights.get_nowait())
+        except queue.Empty:
+            pass
+
+        epsilon = max(MIN_EPSILON, EPSILON_DECAY ** games)
+        live = ~dones
+        states = obs[live]
+        actions = choose_actions(net, obs, env.action_mask(), epsilon, rng)
+        obs, rewards, dones = env.step(actions)
+        transitions.put(
+            (states, actions[live], rewards[live], obs[live], dones[live])
+        )
+
+        if dones.all():
+            games += num_envs
+            counters[actor_id] = games
+            obs = env.reset(env_seed)
+            dones = np.zeros(num_envs, dtype=bool)
+
+
+def _state_dict_arrays(policy_net):
+    """
+    Copy of the network's state dict as NumPy arrays on the cpu
+    """
+    return {
+        key: value.detach().cpu().numpy()
+        for key, value in policy_net.state_dict().items()
+    }
+
+
+def _publish(weights_queues, state_dict):
+    """
+    Replace any weights an actor has not picked up with state_dict
+    """
+    for weights in weights_queues:
+        try:
+            weights.get_nowait()
+        except queue.Empty:
+            pass
+        weights.put(state_dict)
+
+
+def _shutdown(processes, transitions, stop, timeout=10.0):
+    """
+    Stop the actors, draining transitions so none is stuck on a full queue
+    """
+    stop.set()
+    deadline = time.perf_counter() + timeout
+    while any(p.is_alive() for p in processes) and time.perf_counter() < deadline:
+        try:
+            while True:
+                transitions.get_nowait()
+        except queue.Empty:
+            pass
+        for process in processes:
+            process.join(timeout=0.05)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+class Throughput:
+    """
+    Transition and update counters of a training run
+
+    Attributes:
+        transitions (int): Transitions received by the learner
+        updates (int): Gradient steps taken
+        start (float): Wall clock time training started
+
+    Methods:
+        stats(games): Return counters and rates
+    """
+
+    def __init__(self):
+        self.transitions = 0
+        self.updates = 0
+        self.start = time.perf_counter()
+
+    def stats(self, games=0):
+        """
+        Return counters and rates
+
+        Args:
+            games (int): Games finished by all actors
+
+        Returns:
+            dict: Transitions, updates and games, with transitions and
+                updates per second
+        """
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return dict(
+            transitions=self.transitions,
+            updates=self.updates,
+            games=games,
+            elapsed=elapsed,
+            transitions_per_sec=self.transitions / elapsed,
+            updates_per_sec=self.updates / elapsed,
+        )
+
+
+def train(epoch, actors=4, updates=20000, envs_per_actor=16, seed=None,
+          log_every=1000, save=True, buffer_size=BUFFER_SIZE, prioritized=False,
+          replay_path=None):
+    """
+    Train a DQN for epoch with parallel actors and one learner
+
+    The learner runs in this process. Actors are started before torch is
+    imported, so they never hold a copy of it.
+
+    Args:
+        epoch (int): Epoch number
+        actors (int): Number of actor processes
+        updates (int): Number of gradient steps
+        envs_per_actor (int): Games each actor plays at once
+        seed (int): Base seed for the actors' games
+        log_every (int): Updates between progress lines, 0 for none
+        save (bool): Save five_crowns_dqn_{epoch}.pth and its .npz export
+        buffer_size (int): Replay buffer capacity
+        prioritized (bool): Prioritized replay, with importance weights
+            annealed from BETA to 1 over the run
+        replay_path (str): Directory to keep the replay buffer in, None for
+            memory
+
+    Returns:
+        dict: Throughput stats of the run
+    """
+    stop = mp.Event()
+    transitions = mp.Queue(maxsize=64 * actors)
+    weights_queues = [mp.Queue(maxsize=1) for _ in range(actors)]
+    counters = mp.Array("l", actors, lock=False)
+    processes = [
+        mp.Process(
+            target=actor,
+            args=(k, epoch, envs_per_actor, seed, weights_queues[k], transitions,
+                  stop, counters),
+            daemon=True,
+        )
+        for k in range(actors)
+    ]
+    for process in processes:
+        process.start()
+
+    import torch
+    import torch.optim as optim
+    from dqn import DQN
+    from dqn_registry import get_device
+
+    device = get_device()
+    policy_net = DQN(STATE_DIM, ACTION_DIM).to(device)
+    target_net = DQN(STATE_DIM, ACTION_DIM).to(device)
+    target_net.load_state_dict(policy_net.state_dict())
+    target_net.eval()
+    optimizer = optim.Adam(policy_net.parameters(), lr=LEARNING_RATE)
+    buffer = ReplayBuffer(
+        buffer_size, STATE_DIM, prioritized=prioritized, path=replay_path, seed=seed
+    )
+    counts = Throughput()
+    _publish(weights_queues, _state_dict_arrays(policy_net))
+
+    try:
+        while counts.updates < updates:
+            # Take every batch waiting, and block only while the buffer fills
+            try:
+                block = buffer.size() < BATCH_SIZE
+                while True:
+                    batch = transitions.get(block=block, timeout=60)
+                    block = False
+                    buffer.add_batch(*batch)
+                    counts.transitions += len(batch[0])
+            except queue.Empty:
+                if buffer.size() < BATCH_SIZE:
+                    raise RuntimeError("Actors stopped sending transitions")
+
+            beta = BETA + (1 - BETA) * counts.updates / updates
+            *sample, indices, weights = buffer.sample(BATCH_SIZE, beta)
+            states, actions, rewards, next_states, dones, weights = (
+                torch.as_tensor(column, device=device) for column in (*sample, weights)
+            )
+
+            # Calculate the q-values and loss
+            q_values = policy_net(states).gather(1, actions.long().unsqueeze(1)).squeeze(1)
+            with torch.no_grad():
+                next_q_values = target_net(next_states).max(1)[0]
+            target = rewards + GAMMA * next_q_values * (1 - dones.float())
+            td_errors = q_values - target
+            # Mean squared error, weighted to undo prioritized sampling
+            loss = (weights * td_errors.pow(2)).mean()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            buffer.update_priorities(indices, td_errors.detach().cpu().numpy())
+            counts.updates += 1
+
+            if counts.updates % TARGET_UPDATE == 0:
+                target_net.load_state_dict(policy_net.state_dict())
+            if counts.updates % SYNC_EVERY == 0:
+                _publish(weights_queues, _state_dict_arrays(policy_net))
+            if log_every and counts.updates % log_every == 0:
+                stats = counts.stats(sum(counters))
+                print(
+                    f"Updates {stats['updates']}, Loss: {loss.item():.4f}, "
+                    f"Games: {stats['games']}, "
+                    f"Transitions/s: {stats['transitions_per_sec']:.0f}, "
+                    f"Updates/s: {stats['updates_per_sec']:.0f}"
+                )
+    finally:
+        _shutdown(processes, transitions, stop)
+        buffer.flush()
+
+    if save:
+        torch.save(policy_net.state_dict(), CHECKPOINT.format(epoch=epoch))
+        export(epoch)
+    return counts.stats(sum(counters))
+
+
+def parse_args():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--epoch", type=int, default=3)
+    parser.add_argument("--actors", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--envs-per-actor", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE)
+    parser.add_argument("--prioritized", action="store_true")
+    parser.add_argument("--replay-path", type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(train(
+        args.epoch,
+        actors=args.actors,
+        updates=args.updates,
+        envs_per_actor=args.envs_per_actor,
+        seed=args.seed,
+        buffer_size=args.buffer_size,
+        prioritized=args.prioritized,
+        replay_path=args.replay_path,
+    ))
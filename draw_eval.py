@@ -0,0 +1,56 @@
+"""
+Expected score of drawing a random unseen card
+"""
+
+from collections import Counter
+
+from scoring import get_best_discard
+
+
+def unseen_cards(hand, game):
+    """
+    Count cards not in hand or discard pile, grouped by identity
+
+    Args:
+        hand (list): List of cards in hand
+        game (Game): Game object
+
+    Returns:
+        Counter: Count of each unseen card
+    """
+    unseen = Counter(game.get_full_deck().get_cards())
+    unseen.subtract(game.get_discard_pile())
+    unseen.subtract(hand)
+    return unseen
+
+
+def expected_draw_score(hand, game, unseen=None):
+    """
+    Get exact expected best score after drawing a random unseen card
+
+    Each distinct card is scored once and weighted by its number of
+    unseen copies.
+
+    Args:
+        hand (list): List of cards in hand
+        game (Game): Game object
+        unseen (Counter): Count of each unseen card, computed if not given
+
+    Returns:
+        float: Expected score after drawing and discarding
+    """
+    if unseen is None:
+        unseen = unseen_cards(hand, game)
+
+    total_score = 0
+    total_count = 0
+    for card, count in unseen.items():
+        if count <= 0:
+            continue
+        _, draw_score = get_best_discard(hand + [card], game)
+        total_score += count * draw_score
+        total_count += count
+
+    if total_count == 0:
+        return float("inf")
+    return total_score / total_count
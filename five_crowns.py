@@ -1,8 +1,10 @@
 '''
 Provides Game object for five crown games
 '''
+from collections import Counter
+
 from scoring import score_hand
-from deck import Deck, Card
+from deck import Deck, Card, make_rng
 from constants import DRAW_CARD, GET_DISCARD
 
 # Game constants
@@ -16,15 +18,19 @@ class Game:
     Represents a 5 crown game session
     """
 
-    def __init__(self, players, ranks=RANKS, suits=SUITS, jokers=JOKERS, epoch=3):
+    def __init__(self, players, ranks=RANKS, suits=SUITS, jokers=JOKERS, epoch=3,
+                 seed=None, stream=0):
         """
         Create New Game
+
+        Games with the same seed and stream are dealt and drawn identically
         """
         # Deck info
         self._ranks = ranks
         self._suits = suits
         self._jokers = jokers
-        self._deck = Deck(ranks, suits, jokers, 2)
+        self._rng = make_rng(seed, stream)
+        self._deck = Deck(ranks, suits, jokers, 2, rng=self._rng)
         self._full_deck = Deck(RANKS, SUITS, JOKERS, 2)
 
         # Game info
@@ -33,6 +39,9 @@ class Game:
         self._active_player = 0
         self._discard_pile = []
 
+        # Count of cards each player has not seen
+        self._unseen = [Counter() for _ in players]
+
         # Going out
         self._go_out = False
         self._remaining_players = len(players)
@@ -74,6 +83,12 @@ class Game:
         """
         return self._full_deck
 
+    def get_rng(self):
+        """
+        Return random number generator of the game
+        """
+        return self._rng
+
     def get_epoch(self):
         """
         Gets epoch number
@@ -121,17 +136,53 @@ class Game:
     def get_player_hand(self, player_id):
         return self._players[player_id].hand
 
+    def get_unseen_cards(self, player_id):
+        """
+        Return count of each card not in player's hand or discard pile
+        """
+        return self._unseen[player_id]
+
+    def track_draw(self, player_id, card):
+        """
+        Update unseen cards after player draws card from deck
+        """
+        self._unseen[player_id][card] -= 1
+
+    def track_take_discard(self, player_id, card):
+        """
+        Update unseen cards after player takes card from discard pile
+        """
+        self._adjust_others(player_id, card, 1)
+
+    def track_discard(self, player_id, card):
+        """
+        Update unseen cards after player discards card
+        """
+        self._adjust_others(player_id, card, -1)
+
+    def _adjust_others(self, player_id, card, delta):
+        """
+        Change unseen count of card for every player except player_id
+        """
+        for i, unseen in enumerate(self._unseen):
+            if i != player_id:
+                unseen[card] += delta
+
     def initialize_game(self):
         """
         Shuffle deck, hand out cards, and flip initial discard
         """
         self._deck.shuffle()
+        full_deck = Counter(self._full_deck.get_cards())
         # Deal cards
         for i in range(self.num_players()):
             self._players[i].hand = self._deck.deal(self._epoch)
+            self._unseen[i] = full_deck.copy()
+            self._unseen[i].subtract(self._players[i].hand)
 
         # Flip initial discard
         self._discard_pile.append(self._deck.deal(1)[0])
+        self.track_discard(None, self._discard_pile[-1])
 
     def play_round(self):
         """
@@ -154,41 +205,112 @@ class Game:
         if self.is_game_over():
             return
 
+        # Draw Phase
+        self._draw_card(player, player.draw_phase(self))
+
+        # Discard Phase
+        discard = player.discard_phase(self)
+        player.hand.remove(discard)
+        self._discard_card(player, discard)
+
+        # Go out Phase
+        self._end_turn(player)
+
+    def apply_move(self, source, discard=None):
+        """
+        Play active player's turn in place, without asking the player
+
+        Args:
+            source (int): DRAW_CARD to draw from deck, GET_DISCARD to take
+                last discard, None if the player has already drawn
+            discard (Card): Card to discard, None to discard the card taken
+
+        Returns:
+            tuple: Undo record to pass to undo_move
+        """
+        player = self._players[self._active_player]
+        record = (
+            self._active_player,
+            self._go_out,
+            self._remaining_players,
+            self._game_over,
+        )
+
+        card = None if source is None else self._draw_card(player, source)
+        if discard is None:
+            discard = card
+        position = player.hand.index(discard)
+        del player.hand[position]
+        self._discard_card(player, discard)
+        self._end_turn(player)
+
+        return (source, card, discard, position) + record
+
+    def undo_move(self, record):
+        """
+        Restore the exact state before apply_move
+
+        Args:
+            record (tuple): Undo record returned by apply_move
+        """
+        source, card, discard, position = record[:4]
+        player_id, go_out, remaining_players, game_over = record[4:]
+        player = self._players[player_id]
+
+        self._active_player = player_id
+        self._go_out = go_out
+        self._remaining_players = remaining_players
+        self._game_over = game_over
+
+        # Take back discard
+        self._discard_pile.pop()
+        self._adjust_others(player_id, discard, 1)
+        player.hand.insert(position, discard)
+
+        # Return card taken
+        if source is None:
+            return
+        player.hand.pop()
+        if source == GET_DISCARD:
+            self._discard_pile.append(card)
+            self._adjust_others(player_id, card, -1)
+        else:
+            self._deck.put_back(card)
+            self._unseen[player_id][card] += 1
+
+    def _draw_card(self, player, source):
+        """
+        Move a card from deck or discard pile into player's hand
+        """
+        if source == GET_DISCARD:
+            card = self._discard_pile.pop(-1)
+            self.track_take_discard(player.player_id, card)
+        else:
+            card = self._deck.deal(1)[0]
+            self.track_draw(player.player_id, card)
+        player.hand.append(card)
+        return card
+
+    def _discard_card(self, player, discard):
+        """
+        Put a card removed from player's hand onto discard pile
+        """
+        self._discard_pile.append(discard)
+        self.track_discard(player.player_id, discard)
+
+    def _end_turn(self, player):
+        """
+        Update going out state and pass turn to next player
+        """
+        if self._deck.size() == 0:
+            self._game_over = True
         if self._go_out:
-            # Draw Phase
-            if player.draw_phase(self) == GET_DISCARD:
-                player.hand.append(self._discard_pile.pop(-1))
-            else:
-                player.hand.append(self._deck.deal(1)[0])
-
-            # Discard Phase
-            discard = player.discard_phase(self)
-            player.hand.remove(discard)
-            self._discard_pile.append(discard)
-
-            # Go out Phase
-            if self._deck.size() == 0:
-                self._game_over = True
+            # Player reveals hand after going out
             self._remaining_players -= 1
             if self._remaining_players == 0:
                 self._game_over = True
-        else:
-            # Draw Phase
-            if player.draw_phase(self) == GET_DISCARD:
-                player.hand.append(self._discard_pile.pop(-1))
-            else:
-                player.hand.append(self._deck.deal(1)[0])
-
-            # Discard Phase
-            discard = player.discard_phase(self)
-            player.hand.remove(discard)
-            self._discard_pile.append(discard)
-
-            # Go out Phase
-            if self._deck.size() == 0:
-                self._game_over = True
-            if score_hand(player.hand,self) == 0:
-                self._remaining_players -= 1
-                self._go_out = True
+        elif score_hand(player.hand, self) == 0:
+            self._remaining_players -= 1
+            self._go_out = True
 
         self._active_player = (self._active_player + 1) % self.num_players()
@@ -2,10 +2,9 @@
 Greedy player always takes action that minimize score for turn
 """
 
-import copy
-
 from player import Player
 from scoring import get_best_discard
+from draw_eval import expected_draw_score
 from constants import GET_DISCARD, DRAW_CARD
 
 
@@ -38,18 +37,11 @@ class GreedyPlayer(Player):
         _, discard_score = get_best_discard(temp_hand, game, excluded_discard=new_card)
 
         # Get best expected score if we draw random
-        remaining_deck = copy.deepcopy(game.get_full_deck().get_cards())
-        draw_scores = []
-        for card in game.get_discard_pile() + self.hand:
-            remaining_deck.remove(card)
-        for card in remaining_deck:
-            temp_hand = self.hand + [card]
-            _, draw_score = get_best_discard(temp_hand, game)
-            draw_scores.append(draw_score)
-        expected_draw_score = sum(draw_scores) / len(draw_scores)
+        draw_score = expected_draw_score(
+            self.hand, game, game.get_unseen_cards(self.player_id))
 
         # Take action with better expected score
-        if discard_score < expected_draw_score:
+        if discard_score < draw_score:
             return GET_DISCARD
         return DRAW_CARD
 
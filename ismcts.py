@@ -0,0 +1,237 @@
+"""
+Information set MCTS: one tree shared by a fresh determinization per
+iteration
+"""
+
+import math
+import time
+from copy import deepcopy
+
+from constants import GET_DISCARD, DRAW_CARD
+from budget import SearchBudget
+from rollout import DEPTH, rollout
+
+
+class ISNode:
+    """
+    Node of an information set tree, reached by a move every player sees
+
+    Attributes:
+        - player_id: ID of the player whose move leads to the node
+        - children: (source, discard) of each move mapped to its child node
+        - n: The number of times the node has been visited
+        - r: The reward of the node
+        - avail: The number of times the node's move was legal
+
+    Methods:
+        - best_key(keys): Returns the legal move with the best UCB value
+    """
+
+    def __init__(self, player_id):
+        self.player_id = player_id
+        self.children = {}
+        self.n = 0
+        self.r = 0
+        self.avail = 1
+
+    def best_key(self, keys):
+        """
+        Returns the legal move with the best UCB value, counting only the
+        iterations in which each move was legal
+
+        Args:
+            - keys: Moves legal in this determinization
+
+        Returns:
+            - tuple: Key of the best child
+        """
+        max_ucb = -float("inf")
+        max_key = None
+        for key in keys:
+            child = self.children[key]
+            exploitation = child.r / child.n if child.n > 0 else 0
+            exploration = math.sqrt(2 * math.log(child.avail) / child.n) if child.n > 0 else 0
+            ucb = exploitation + exploration
+            if ucb > max_ucb:
+                max_ucb = ucb
+                max_key = key
+        return max_key
+
+
+def redeal(game, player_id, rng):
+    """
+    Shuffle the cards player_id cannot see between the deck and every
+    other player's hand, in place
+
+    Args:
+        game (Game): Game object
+        player_id (int): ID of player whose view is kept
+        rng (random.Random): Random generator for the redeal
+    """
+    deck = game.get_deck().get_cards()
+    hands = [
+        game.get_player_hand(i) for i in range(game.num_players()) if i != player_id
+    ]
+    hidden = deck + [card for hand in hands for card in hand]
+    rng.shuffle(hidden)
+    start = len(deck)
+    deck[:] = hidden[:start]
+    for hand in hands:
+        hand[:] = hidden[start : start + len(hand)]
+        start += len(hand)
+
+
+def legal_moves(game, root_card=None, is_root=False):
+    """
+    Get every move of the active player, keyed by what other players see
+
+    Args:
+        game (Game): Game object
+        root_card (Card): Card taken from discard pile at the root
+        is_root (bool): Whether the active player has already drawn
+
+    Returns:
+        dict: (source, discard) mapped to apply_move arguments
+    """
+    hand = game.get_player_hand(game.get_active_player())
+    if is_root:
+        return {(None, card): (None, card) for card in hand if card != root_card}
+
+    moves = {}
+    if game.get_discard_pile():
+        for card in hand:
+            moves[(GET_DISCARD, card)] = (GET_DISCARD, card)
+    deck = game.get_deck().get_cards()
+    if deck:
+        for card in hand:
+            moves[(DRAW_CARD, card)] = (DRAW_CARD, card)
+        moves.setdefault((DRAW_CARD, deck[-1]), (DRAW_CARD, None))
+    return moves
+
+
+def is_terminal(game):
+    """
+    Check if no more turns can be played
+    """
+    return game.is_game_over() or game.get_deck().size() == 0
+
+
+def _root_visits(root, root_moves):
+    """
+    Visit count of every root move, 0 for moves not yet expanded
+    """
+    visits = [child.n for child in root.children.values()]
+    return visits + [0] * (root_moves - len(visits))
+
+
+def ismcts_policy(cpu_time, player_id, rollout_policy="random"):
+    """
+    Information set MCTS policy for player
+
+    Every iteration redeals the hidden cards and plays moves in place on a
+    single copy of the game, undoing them afterwards.
+
+    Args:
+        cpu_time (int): Process CPU seconds per search, unless the policy
+            is called with its own SearchBudget
+        player_id (int): Player ID
+        rollout_policy (str): Rollout policy, "random" or "heuristic"
+
+    Returns:
+        function: Policy function, whose stats attribute holds the
+            iteration and node counts, seconds used, whether the last
+            search stopped early and rollouts per second
+    """
+
+    def search_policy(game, root_card, budget=None):
+        """
+        ISMCTS Policy function
+
+        Args:
+            game (Game): Game object, with player_id to discard
+            root_card (Card): Card taken from discard pile this turn
+            budget (SearchBudget): Budget for this search, cpu_time
+                seconds if not given
+
+        Returns:
+            tuple: ("root", card) to discard
+        """
+        if budget is None:
+            budget = SearchBudget(cpu_time=cpu_time)
+        temp_game = deepcopy(game)
+        rng = temp_game.get_rng()
+        root = ISNode(None)
+        root_moves = len(legal_moves(temp_game, root_card, is_root=True))
+        nodes = 1
+
+        budget.start()
+        iters = 0
+        rollout_time = 0.0
+        while not budget.should_stop(iters, _root_visits(root, root_moves)):
+            iters += 1
+            redeal(temp_game, player_id, rng)
+            records = []
+            node = root
+            path = []
+
+            # Selection and Expansion. The root player has already drawn, so
+            # only the game ending stops it, even with an empty deck
+            while not (
+                temp_game.is_game_over() or (node is not root and is_terminal(temp_game))
+            ):
+                moves = legal_moves(temp_game, root_card, is_root=node is root)
+                tried = [key for key in moves if key in node.children]
+                for key in tried:
+                    node.children[key].avail += 1
+                untried = [key for key in moves if key not in node.children]
+                if untried:
+                    key = rng.choice(untried)
+                    child = ISNode(temp_game.get_active_player())
+                    node.children[key] = child
+                    nodes += 1
+                else:
+                    key = node.best_key(tried)
+                    child = node.children[key]
+                records.append(temp_game.apply_move(*moves[key]))
+                node = child
+                path.append(node)
+                if untried:
+                    break
+
+            # Simulation
+            start = time.process_time()
+            payoff_array = rollout(temp_game, rollout_policy, rng, DEPTH)
+            rollout_time += time.process_time() - start
+
+            # Backpropagation
+            for node in path:
+                node.n += 1
+                node.r += payoff_array[node.player_id]
+            for record in reversed(records):
+                temp_game.undo_move(record)
+
+        # Find best move
+        best_rank = None
+        best_action = None
+        for (_, card), child in root.children.items():
+            rank = budget.rank(child.n, child.r)
+            if best_rank is None or rank > best_rank:
+                best_rank = rank
+                best_action = ("root", card)
+        if best_action is None:
+            # Nothing was searched, such as a game already over: any legal
+            # discard
+            _, card = next(iter(legal_moves(game, root_card, is_root=True)))
+            best_action = ("root", card)
+
+        search_policy.stats = dict(
+            iters=iters,
+            nodes=nodes,
+            elapsed=budget.elapsed(),
+            stopped_early=budget.stopped_early,
+            rollouts_per_sec=iters / rollout_time if rollout_time > 0 else 0.0,
+        )
+        return best_action
+
+    search_policy.stats = {}
+    return search_policy
@@ -4,204 +4,476 @@ MCTS class
 
 import math
 import time
-from copy import deepcopy
+import multiprocessing as mp
+from multiprocessing import util
+from copy import copy, deepcopy
 
-from scoring import score_hand
+from scoring import leave_one_out_scores
+from score_cache import ScoreCache
 from random_player import RandomPlayer
+from constants import GET_DISCARD
+from deck import make_rng
+from budget import SearchBudget
+from rollout import DEPTH, rollout
+from ismcts import is_terminal, legal_moves, redeal
+from node_pool import Node, NodePool
+from snapshot import GameSnapshot
 
-DEPTH = 20
+MAX_NODES = 50000
+TRANSPOSITION_SIZE = 50000
 
+# A node with n visits may have ceil(WIDENING * n ** WIDENING_POWER) children
+WIDENING = 1.0
+WIDENING_POWER = 0.5
 
-class Edge:
+# Search worker pools of this process, keyed by size
+_SEARCH_POOLS = {}
+# Above the exit priority of each pool's own terminate finalizer, so the
+# pools are closed and joined before they would be terminated
+POOL_EXIT_PRIORITY = 20
+
+
+def move_priors(game, moves):
     """
-    Edge class for MCTS
+    Score of the active player's hand after each move, from one
+    leave-one-out pass per draw source
+
+    Args:
+        game (Game): Game object
+        moves (list): (source, discard) moves of the active player
 
-    Attributes:
-        - child: The child node
-        - action: The action taken to reach the child node
-        - n: The number of times the edge has been visited
+    Returns:
+        list: Hand score after each move, lower is better
+    """
+    hand = game.get_player_hand(game.get_active_player())
+    after = {}
+    for source in {source for source, _ in moves}:
+        if source is None:
+            full = hand
+        elif source == GET_DISCARD:
+            full = hand + [game.get_discard_pile()[-1]]
+        else:
+            full = hand + [game.get_deck().get_cards()[-1]]
+        after[source] = dict(zip(full, leave_one_out_scores(full, game)))
+    return [after[source][discard] for source, discard in moves]
+
+
+def _moves(game, root_card, is_root, prior=False):
+    """
+    Moves of the active player, no moves once the game cannot continue.
+    The root player has already drawn, so only the game ending stops it.
+    With prior, the moves are ordered so the lowest hand score after the
+    move is last, ready to be popped.
     """
+    if game.is_game_over() or (not is_root and is_terminal(game)):
+        return []
+    moves = list(legal_moves(game, root_card, is_root))
+    if prior:
+        scores = move_priors(game, moves)
+        order = sorted(range(len(moves)), key=lambda i: scores[i], reverse=True)
+        moves = [moves[i] for i in order]
+    return moves
 
-    def __init__(self, child, action=None):
-        self.child = child
-        self.action = action
-        self.n = 0
 
+def _widened(node, widening):
+    """
+    Check if node has enough visits to add another child
+    """
+    if widening is None:
+        return True
+    limit = math.ceil(widening * max(node.n, 1) ** WIDENING_POWER)
+    return len(node.children) < limit
 
-class Node:
+
+class TranspositionTable(ScoreCache):
     """
-    Node class for MCTS
+    LRU table of search nodes keyed by the GameSnapshot of their state
 
-    Attributes:
-        - state: The state of the node
-        - edges: The edges from the node
-        - n: The number of times the node has been visited
-        - r: The reward of the node
-        - unused_actions: The actions that have not been explored yet
-        - parent: The parent node
+    Hits are transpositions: a state already reached by another line of
+    the tree. Nodes evicted from their NodePool have no parent, so finding
+    one counts as a miss.
+    """
 
-    Methods:
-        - best_child(): Returns the best child node based on the UCB formula
-        - is_expanded(): Determines whether the node has been fully expanded or not
+    def get(self, key):
+        node = self._scores.get(key)
+        if node is None or node.parent is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return node
+
+
+def _after(snapshot, game, record):
+    """
+    Snapshot of game after the move apply_move returned record for
     """
+    source, card, discard, _, player_id = record[:5]
+    return snapshot.after_move(
+        player_id,
+        source,
+        card,
+        discard,
+        game.get_active_player(),
+        game.is_going_out(),
+        game.get_remaining_players(),
+        game.is_game_over(),
+    )
+
+
+def search(root, game, root_card, budget, pool, rollout_policy="random",
+           widening=None, table=None):
+    """
+    Run MCTS iterations from root until the budget says stop
 
-    def __init__(self, state, parent=None):
-        self.state = state
-        self.edges = []
-        self.n = 0
-        self.r = 0
-        self.unused_actions = state.get_actions()
-        self.parent = parent
+    Each iteration replays the moves from the root on game and undoes
+    them afterwards, so nodes do not hold a copy of the game.
 
-    def best_child(self):
-        """
-        Returns the best child node based on the UCB formula
+    With progressive widening, moves are expanded best prior first, and a
+    node only gets another child once its visit count allows it.
 
-        Returns:
-            - int: The index of the best child node
-        """
-        # Get best child with UCB
-        T = sum(e.n for e in self.edges)
-        max_ucb = -float("inf")
-        max_index = -1
-        for i, e in enumerate(self.edges):
-            exploitation = e.child.r / e.child.n if e.child.n > 0 else 0
-            exploration = math.sqrt(2 * math.log(T) / e.n) if e.n > 0 else 0
-            ucb = exploitation + exploration
-            if ucb > max_ucb:
-                max_ucb = ucb
-                max_index = i
-        return max_index
-
-    def is_expanded(self):
-        """
-        Determines whether the node has been fully expanded or not
+    With a table, the snapshot of each replayed state is updated move by
+    move. A new node whose state is already in the tree starts with the
+    visits and reward of that node, while the tree itself stays a tree.
 
-        Returns:
-            - bool: True if the node has been fully expanded else False
-        """
-        return len(self.edges) == len(self.state.get_actions())
+    Args:
+        root (Node): Root of the search tree
+        game (Game): Game at the root, restored before returning
+        root_card (Card): Card taken from discard pile this turn
+        budget (SearchBudget): Budget for the search
+        pool (NodePool): Store the tree's nodes are added to
+        rollout_policy (str): Rollout policy, "random" or "heuristic"
+        widening (float): Progressive widening factor, None to expand
+            every move before descending
+        table (TranspositionTable): Nodes by snapshot, None to search
+            without one
+
+    Returns:
+        tuple: Number of iterations run, CPU seconds spent in rollouts
+    """
+    rng = game.get_rng()
+    root_snapshot = GameSnapshot.from_game(game) if table is not None else None
+    prior = widening is not None
+    if root.untried is None:
+        root.untried = _moves(game, root_card, True, prior)
+    budget.start()
+    iters = 0
+    rollout_time = 0.0
+    while not budget.should_stop(iters, root.visits()):
+        iters += 1
+        if pool.full():
+            pool.evict(root)
+        node = root
+        snapshot = root_snapshot
+        records = []
+
+        # Traversal
+        while True:
+            if node.untried is None:
+                node.untried = _moves(game, root_card, False, prior)
+            if (node.untried and _widened(node, widening)) or not node.children:
+                break
+            node = node.best_child()
+            records.append(game.apply_move(*node.key))
+            if table is not None:
+                snapshot = _after(snapshot, game, records[-1])
+
+        # Expansion
+        if node.untried and _widened(node, widening):
+            key = node.untried.pop()
+            actor = game.get_active_player()
+            records.append(game.apply_move(*key))
+            node = pool.add(node, key, actor)
+            if table is not None:
+                snapshot = _after(snapshot, game, records[-1])
+                known = table.get(snapshot)
+                if known is None:
+                    table.put(snapshot, node)
+                elif known.actor == actor:
+                    node.n, node.r = known.n, known.r
+
+        # Simulation
+        start = time.process_time()
+        payoff_array = rollout(game, rollout_policy, rng, DEPTH)
+        rollout_time += time.process_time() - start
+
+        # Backpropagation
+        while node.parent is not None:
+            node.n += 1
+            node.r += payoff_array[node.actor]
+            node = node.parent
+        root.n += 1
+        for record in reversed(records):
+            game.undo_move(record)
+
+    return iters, rollout_time
+
+
+def root_stats(root):
+    """
+    Get visit and reward totals of every root action
+
+    Args:
+        root (Node): Root of the search tree
+
+    Returns:
+        dict: Move mapped to [visits, reward]
+    """
+    return {child.key: [child.n, child.r] for child in root.children}
 
 
-def partial_score(hand, game):
+def merge_root_stats(all_stats):
     """
-    Heuristic for hand score before game ends
+    Sum root action stats from several independent searches
 
     Args:
-        hand (list): List of cards in hand
-        game (Game): Game object
+        all_stats (list): Dicts returned by root_stats
 
     Returns:
-        int: Partial score of the hand
+        dict: Move mapped to summed [visits, reward]
     """
-    # Heuristic for hand score before game ends
-    score = score_hand(hand, game)
-    return (100 if score == 0 else 0) - score
+    merged = {}
+    for stats in all_stats:
+        for action, values in stats.items():
+            totals = merged.setdefault(action, [0, 0])
+            for k, value in enumerate(values):
+                totals[k] += value
+    return merged
 
 
-def simulate(state):
+def best_root_action(stats, budget=None):
     """
-    Simulate game until DEPTH or finish
+    Get root action ranked first by budget.rank, the highest average
+    reward without a budget
 
     Args:
-        state (State): State of the game
+        stats (dict): Move mapped to [visits, reward]
+        budget (SearchBudget): Budget the search ran on
 
     Returns:
-        list: List of partial scores for each player
+        tuple: Best action, None if no action was searched
+    """
+    best_rank = None
+    best_action = None
+    for action, (n, r) in stats.items():
+        rank = budget.rank(n, r) if budget is not None else (r / n,)
+        if best_rank is None or rank > best_rank:
+            best_rank = rank
+            best_action = action
+    return best_action
+
+
+def _search_pool(workers):
+    """
+    Get this process's pool of search workers, None if this process is a
+    pool worker itself and cannot start children
+    """
+    if mp.current_process().daemon:
+        return None
+    pool = _SEARCH_POOLS.get(workers)
+    if pool is None:
+        if not _SEARCH_POOLS:
+            # Multiprocessing finalizers also run when an executor worker
+            # exits, unlike atexit
+            util.Finalize(None, close_search_pools, exitpriority=POOL_EXIT_PRIORITY)
+        pool = mp.Pool(workers)
+        _SEARCH_POOLS[workers] = pool
+    return pool
+
+
+def close_search_pools():
     """
-    d = 0
+    Close and join every search worker pool of this process
+
+    Runs when the process exits, so each process keeps one pool for all
+    its searches.
+    """
+    while _SEARCH_POOLS:
+        _, pool = _SEARCH_POOLS.popitem()
+        pool.close()
+        pool.join()
+
+
+def _search_worker(args):
+    """
+    Search one independent tree in a worker process
+
+    Args:
+        args (tuple): (game, root card, player ID, SearchBudget, node cap,
+            transposition table size, (seed, stream) for a fresh
+            determinization or None, rollout policy, widening factor)
 
-    # Make Copy of game
-    temp_game = deepcopy(state.game)
-    temp_players = [RandomPlayer(i) for i in range(temp_game.num_players())]
-    temp_hands = [deepcopy(player.hand) for player in temp_game._players]
-    for player, new_hand in zip(temp_players, temp_hands):
-        player.hand = new_hand
-    temp_game._players = temp_players
+    Returns:
+        tuple: (root_stats of the tree, iterations run, seconds used,
+            whether the search stopped early, seconds in rollouts,
+            NodePool stats, TranspositionTable stats)
+    """
+    (game, root_card, player_id, budget, max_nodes, table_size, seed,
+     rollout_policy, widening) = args
+    if seed is not None:
+        game = deepcopy(game)
+        redeal(game, player_id, make_rng(*seed))
+    root = Node()
+    nodes = NodePool(max_nodes)
+    nodes.adopt(root)
+    table = TranspositionTable(table_size)
+    iters, rollout_time = search(
+        root, game, root_card, budget, nodes, rollout_policy, widening, table
+    )
+    return (
+        root_stats(root),
+        iters,
+        budget.elapsed(),
+        budget.stopped_early,
+        rollout_time,
+        nodes.stats(root),
+        table.stats(),
+    )
+
+
+def _rate(count, seconds):
+    """
+    Count per second, 0 if no time was measured
+    """
+    return count / seconds if seconds > 0 else 0.0
 
-    # Run game until DEPTH or finish
-    while not temp_game.is_game_over() and d < DEPTH:
-        temp_game.play_round()
-        d += 1
 
-    return [
-        partial_score(temp_game._players[i].hand, temp_game)
-        for i in range(temp_game.num_players())
-    ]
+def _merge_table_stats(all_stats):
+    """
+    Sum TranspositionTable stats of several searches, with the hit rate
+    of all their lookups
+    """
+    merged = {key: sum(stats[key] for stats in all_stats) for key in all_stats[0]}
+    lookups = merged["hits"] + merged["misses"]
+    merged["hit_rate"] = merged["hits"] / lookups if lookups else 0.0
+    return merged
 
 
-def mcts_policy(cpu_time, player_id):
+def _portable_game(game):
+    """
+    Copy of game that can be sent to another process, with players that
+    only hold their hands
+    """
+    temp_game = copy(game)
+    temp_game._players = []
+    for player in game._players:
+        stand_in = RandomPlayer(player.player_id)
+        stand_in.hand = list(player.hand)
+        temp_game._players.append(stand_in)
+    return temp_game
+
+
+def mcts_policy(cpu_time, player_id, max_nodes=MAX_NODES,
+                table_size=TRANSPOSITION_SIZE, workers=1,
+                determinize_workers=True, rollout_policy="random",
+                widening=WIDENING):
     """
     MCTS policy for player
 
+    With more than one worker, each worker process searches its own tree
+    from the root with the same budget, and the root stats are summed
+    before the action is picked.
+
+    Trees are kept in a NodePool of compact nodes. Once it holds
+    max_nodes nodes, the least visited leaves are evicted. A
+    TranspositionTable of up to table_size nodes finds states reached by
+    more than one line.
+
     Args:
-        cpu_time (int): CPU time for MCTS
+        cpu_time (int): Process CPU seconds per search, unless the policy
+            is called with its own SearchBudget
         player_id (int): Player ID
+        max_nodes (int): Maximum number of nodes per tree, None for no
+            limit
+        table_size (int): Maximum number of nodes in transposition table,
+            0 to store none
+        workers (int): Number of processes searching in parallel
+        determinize_workers (bool): Give each worker its own redeal of the
+            hidden cards
+        rollout_policy (str): Rollout policy, "random" or "heuristic"
+        widening (float): Progressive widening factor, None to expand
+            every move of a node before descending
 
     Returns:
-        function: Policy function
+        function: Policy function, whose stats attribute holds the
+            iteration count, seconds used, whether it stopped early,
+            rollouts per second, the live, peak, created and evicted nodes
+            and live and peak bytes and the transposition table stats of
+            the last search
     """
-
-    def search_policy(state):
+    def parallel_policy(game, root_card, pool, budget):
+        """
+        Root-parallel search across the worker pool
+        """
+        base_seed = game.get_rng().getrandbits(64)
+        game = _portable_game(game)
+        tasks = [
+            (
+                game,
+                root_card,
+                player_id,
+                budget,
+                max_nodes,
+                table_size,
+                (base_seed, k) if determinize_workers else None,
+                rollout_policy,
+                widening,
+            )
+            for k in range(workers)
+        ]
+        results = pool.map(_search_worker, tasks)
+        stats = merge_root_stats([r[0] for r in results])
+        node_stats = [r[5] for r in results]
+        search_policy.stats = dict(
+            iters=sum(r[1] for r in results),
+            elapsed=max(r[2] for r in results),
+            stopped_early=all(r[3] for r in results),
+            rollouts_per_sec=_rate(sum(r[1] for r in results), sum(r[4] for r in results)),
+            workers=workers,
+            **{key: sum(s[key] for s in node_stats) for key in node_stats[0]},
+            transpositions=_merge_table_stats([r[6] for r in results]),
+        )
+        return best_root_action(stats, budget)
+
+    def search_policy(game, root_card, budget=None):
         """
         MCTS Policy function
 
         Args:
-            state (State): State of the game
+            game (Game): Determinized game, played on and restored
+            root_card (Card): Card taken from the discard pile, None if
+                drawn
+            budget (SearchBudget): Budget for this search, cpu_time
+                seconds if not given
 
         Returns:
             int: Action to take
         """
-
-        root = Node(state)
-        node_registry = dict()
-
-        end_time = time.time() + cpu_time
-        iters = 0
-        while time.time() < end_time:
-            iters += 1
-            node = root
-
-            # Traversal
-            while node.is_expanded() and not node.state.is_terminal():
-                index = node.best_child()
-                best_child = node.edges[index].child
-                best_child.parent = node
-                node.edges[index].n += 1
-                node = best_child
-
-            # Expansion
-            if not node.state.is_terminal():
-                action = node.unused_actions.pop()
-                new_state = node.state.successor(action)
-                if new_state in node_registry:
-                    child = node_registry[new_state]
-                else:
-                    child = Node(new_state, node)
-                    node_registry[new_state] = child
-                edge = Edge(child, action)
-                edge.n += 1
-                node.edges.append(edge)
-                node = child
-
-            # Simulation
-            payoff_array = simulate(node.state)
-
-            # Backpropagation
-            while node.parent is not None:
-                node.n += 1
-                node.r += payoff_array[node.parent.state.actor()]
-                node = node.parent
-
-        # Find best move
-        best_reward = -float("inf")
-        best_action = None
-        for edge in root.edges:
-            reward = edge.child.r / edge.child.n
-            if reward > best_reward:
-                best_reward = reward
-                best_action = edge.action
-
+        if budget is None:
+            budget = SearchBudget(cpu_time=cpu_time)
+        pool = _search_pool(workers) if workers > 1 else None
+        if pool is not None:
+            return parallel_policy(game, root_card, pool, budget)
+
+        nodes = NodePool(max_nodes)
+        root = Node()
+        nodes.adopt(root)
+        table = TranspositionTable(table_size)
+
+        iters, rollout_time = search(
+            root, game, root_card, budget, nodes, rollout_policy, widening, table
+        )
+        best_action = best_root_action(root_stats(root), budget)
+
+        search_policy.stats = dict(
+            iters=iters,
+            elapsed=budget.elapsed(),
+            stopped_early=budget.stopped_early,
+            rollouts_per_sec=_rate(iters, rollout_time),
+            **nodes.stats(root),
+            transpositions=table.stats(),
+        )
         return best_action
 
+    search_policy.stats = {}
     return search_policy
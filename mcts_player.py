@@ -1,14 +1,27 @@
 import copy
 from player import Player
 from constants import DRAW_CARD, GET_DISCARD
-from mcts import mcts_policy
-from state import State
+from mcts import MAX_NODES, WIDENING, mcts_policy
+from ismcts import ismcts_policy, redeal
+from budget import SearchBudget, TimeBank
 from scoring import get_best_discard
+from draw_eval import expected_draw_score
 
 class MCTSPlayer(Player):
-    def __init__(self, player_id):
+    def __init__(self, player_id, workers=1, ismcts=False, time_bank=None,
+                 iterations=None, rollout="random", max_nodes=MAX_NODES,
+                 widening=WIDENING, early_stop=False):
         super().__init__(player_id)
-        self.policy = mcts_policy(1, player_id)
+        self.ismcts = ismcts
+        self.iterations = iterations
+        self.early_stop = early_stop
+        self.time_bank = TimeBank(total=time_bank)
+        if ismcts:
+            self.policy = ismcts_policy(1, player_id, rollout_policy=rollout)
+        else:
+            self.policy = mcts_policy(
+                1, player_id, max_nodes=max_nodes, workers=workers,
+                rollout_policy=rollout, widening=widening)
         self.prev_discard = None
 
     def draw_phase(self, game):
@@ -18,33 +31,33 @@ class MCTSPlayer(Player):
         _, discard_score = get_best_discard(temp_hand,game,excluded_discard=new_card)
 
         # Get best expected score if we draw random
-        remaining_deck = copy.deepcopy(game.get_full_deck().get_cards())
-        draw_scores = []
-        for card in game.get_discard_pile() + self.hand:
-            remaining_deck.remove(card)
-        for card in remaining_deck:
-            temp_hand = self.hand + [card]
-            _, draw_score = get_best_discard(temp_hand, game)
-            draw_scores.append(draw_score)
-        expected_draw_score = sum(draw_scores)/len(draw_scores)
+        draw_score = expected_draw_score(
+            self.hand, game, game.get_unseen_cards(self.player_id))
 
         # Take action with better expected score
-        if discard_score < expected_draw_score:
+        if discard_score < draw_score:
             self.prev_discard = game.get_discard_pile()[-1]
             return GET_DISCARD
         self.prev_discard = None
         return DRAW_CARD
 
     def discard_phase(self, game):
+        if self.iterations is not None:
+            budget = SearchBudget(iterations=self.iterations, early_stop=self.early_stop)
+            self.time_bank.count_decision()
+        else:
+            budget = SearchBudget(
+                cpu_time=self.time_bank.allocate(game), early_stop=self.early_stop)
+
+        if self.ismcts:
+            action = self.policy(game, self.prev_discard, budget)
+            self.time_bank.spend(self.policy.stats["elapsed"])
+            return action[1]
+
         # Randomize deck and player hands
         temp_game = copy.deepcopy(game)
-        for player in temp_game._players:
-            if player.player_id != game.get_active_player():
-                temp_game._deck._cards.extend(player.hand)
-        temp_game._deck.shuffle
-        for player in temp_game._players:
-            if player.player_id != game.get_active_player():
-                player.hand = temp_game._deck.deal(temp_game.get_epoch())
+        redeal(temp_game, self.player_id, temp_game.get_rng())
         # Get best move by MCTS
-        state = State(temp_game, is_root=True, root_card=self.prev_discard)
-        return self.policy(state)[1]
+        action = self.policy(temp_game, self.prev_discard, budget)
+        self.time_bank.spend(self.policy.stats["elapsed"])
+        return action[1]
@@ -0,0 +1,114 @@
+"""
+Per-epoch index of every scoring meld, built lazily and shared by every
+Game in the process
+"""
+
+import itertools as it
+
+from deck import JOKER_INDEX, MIN_RANK, NUM_RANKS
+
+NUM_SUITS = 5
+COPIES = 2
+
+_INDEXES = {}
+
+
+class MeldIndex:
+    """
+    Every book and run that scores 0 in a given epoch
+
+    Attributes:
+        epoch (int): Epoch the index was built for
+        is_wild (tuple): Whether each card index is wild
+        book_partners (tuple): For each card index, the non-wild card
+            indices of the same rank
+        runs_from (tuple): For each card index, list of
+            (top, inner_naturals, forced_wilds) for every run starting at it
+        melds (dict): Sorted non-wild card indices of a meld mapped to
+            (min_wilds, max_wilds), where max_wilds is None for books
+
+    Methods:
+        is_meld(naturals, wilds): Check if cards form a scoring set
+    """
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        wild_rank = epoch - MIN_RANK
+        self.is_wild = tuple(
+            index == JOKER_INDEX or index % NUM_RANKS == wild_rank
+            for index in range(JOKER_INDEX + 1)
+        )
+        natural_ranks = [r for r in range(NUM_RANKS) if r != wild_rank]
+
+        book_partners = [frozenset() for _ in range(JOKER_INDEX + 1)]
+        runs_from = [[] for _ in range(JOKER_INDEX + 1)]
+        self.melds = {}
+
+        # Books: any copies of one rank, topped up with any number of wilds
+        for rank in natural_ranks:
+            same_rank = [NUM_RANKS * s + rank for s in range(NUM_SUITS)]
+            for index in same_rank:
+                book_partners[index] = frozenset(same_rank)
+            for counts in it.product(range(COPIES + 1), repeat=NUM_SUITS):
+                naturals = tuple(
+                    index
+                    for index, count in zip(same_rank, counts)
+                    for _ in range(count)
+                )
+                if naturals:
+                    self.melds[naturals] = (max(0, 3 - len(naturals)), None)
+
+        # Runs: natural ends, each inner rank natural or wild
+        for suit in range(NUM_SUITS):
+            for low, top in it.combinations(natural_ranks, 2):
+                if top - low < 2:
+                    continue
+                inner = [r for r in range(low + 1, top) if r != wild_rank]
+                forced_wilds = top - low - 1 - len(inner)
+                inner_naturals = tuple(NUM_RANKS * suit + r for r in inner)
+                runs_from[NUM_RANKS * suit + low].append(
+                    (NUM_RANKS * suit + top, inner_naturals, forced_wilds)
+                )
+                for chosen in range(len(inner) + 1):
+                    for subset in it.combinations(inner_naturals, chosen):
+                        naturals = (NUM_RANKS * suit + low,) + subset
+                        naturals += (NUM_RANKS * suit + top,)
+                        wilds = top - low - 1 - chosen
+                        self.melds[naturals] = (wilds, wilds)
+
+        self.book_partners = tuple(book_partners)
+        self.runs_from = tuple(tuple(runs) for runs in runs_from)
+
+    def is_meld(self, naturals, wilds):
+        """
+        Check if cards form a scoring set
+
+        Args:
+            naturals (tuple): Sorted indices of non-wild cards
+            wilds (int): Number of wild cards
+
+        Returns:
+            bool: True if cards form a book or run else False
+        """
+        bounds = self.melds.get(tuple(naturals))
+        if bounds is None:
+            return False
+        min_wilds, max_wilds = bounds
+        return wilds >= min_wilds and (max_wilds is None or wilds <= max_wilds)
+
+
+def get_index(epoch):
+    """
+    Get meld index for epoch, building it on first use
+
+    Args:
+        epoch (int): Epoch number
+
+    Returns:
+        MeldIndex: Index shared by every caller in the process
+    """
+    index = _INDEXES.get(epoch)
+    if index is None:
+        index = MeldIndex(epoch)
+        _INDEXES[epoch] = index
+    return index
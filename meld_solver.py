@@ -0,0 +1,149 @@
+"""
+Exact meld-partition solver for hands of any epoch
+
+Finds the lowest score of a hand over every collection of disjoint books
+and runs, using the same meld rules as scoring.scoring_set:
+    - Book: all non-wild cards share a rank, wild cards fill the rest
+    - Run: all non-wild cards share a suit with distinct ranks, and wild
+      cards fill the gaps between the lowest and highest non-wild card
+
+Latency target: about 1 ms per call for a typical 13 card hand, and under
+10 ms for the worst case hands seen in full epoch 13 games.
+"""
+
+from deck import MIN_RANK, NUM_RANKS
+
+
+class MeldSolver:
+    """
+    Memoized search over disjoint books and runs of one epoch
+
+    Candidate melds come from the epoch's meld_index.MeldIndex.
+    Subproblems only depend on the non-wild cards left and the number of
+    wild cards placed, so one solver can score many hands that share
+    cards, such as every hand left after a single discard.
+
+    Methods:
+        min_score(naturals, wild_values): Lowest score of a hand
+        natural_deadwood(remaining, placed): Lowest non-wild score when
+            exactly placed wild cards go into melds
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._memo = {}
+
+    def min_score(self, naturals, wild_values):
+        """
+        Get lowest score of a hand over all disjoint books and runs
+
+        Every wild card is interchangeable inside a meld, so placing k wild
+        cards always uses the k most valuable ones, leaving the cheapest
+        wild cards as deadwood.
+
+        Args:
+            naturals (tuple): Sorted indices of non-wild cards in hand
+            wild_values (list): Score values of wild cards in hand
+
+        Returns:
+            int: Lowest possible score
+        """
+        wild_prefix = [0]
+        for value in sorted(wild_values):
+            wild_prefix.append(wild_prefix[-1] + value)
+
+        naturals = tuple(naturals)
+        wilds = len(wild_values)
+        best = float("inf")
+        for placed in range(wilds, -1, -1):
+            if wild_prefix[wilds - placed] >= best:
+                break
+            score = self.natural_deadwood(naturals, placed)
+            score += wild_prefix[wilds - placed]
+            if score < best:
+                best = score
+        return best
+
+    def natural_deadwood(self, remaining, placed):
+        """
+        Get lowest score of non-wild cards left out of melds
+
+        Args:
+            remaining (tuple): Sorted indices of non-wild cards
+            placed (int): Exact number of wild cards to put into melds
+
+        Returns:
+            int: Lowest score, or infinity if placed cannot be met
+        """
+        if not remaining:
+            return 0 if placed == 0 else float("inf")
+        key = (remaining, placed)
+        if key in self._memo:
+            return self._memo[key]
+
+        # First card is either deadwood or the lowest card of a meld
+        first = remaining[0]
+        rest = remaining[1:]
+        best = first % NUM_RANKS + MIN_RANK + self.natural_deadwood(rest, placed)
+
+        if best > 0:
+            partners = self._index.book_partners[first]
+            for used, others in _books(rest, partners, placed):
+                score = self.natural_deadwood(others, placed - used)
+                if score < best:
+                    best = score
+        if best > 0:
+            runs = self._index.runs_from[first]
+            for used, others in _runs(rest, runs, placed):
+                score = self.natural_deadwood(others, placed - used)
+                if score < best:
+                    best = score
+
+        self._memo[key] = best
+        return best
+
+
+def _remove_positions(cards, positions):
+    """
+    Return cards with the given positions removed
+    """
+    return tuple(c for i, c in enumerate(cards) if i not in positions)
+
+
+def _books(rest, partners, wilds):
+    """
+    Yield (wilds used, remaining cards) for every book containing the
+    first card, given the other cards of its rank
+    """
+    same_rank = [i for i, c in enumerate(rest) if c in partners]
+    seen = set()
+    for mask in range(1 << len(same_rank)):
+        positions = {p for bit, p in enumerate(same_rank) if mask >> bit & 1}
+        others = _remove_positions(rest, positions)
+        if others in seen:
+            continue
+        seen.add(others)
+        for used in range(max(0, 2 - len(positions)), wilds + 1):
+            yield used, others
+
+
+def _runs(rest, runs, wilds):
+    """
+    Yield (wilds used, remaining cards) for every run starting at the
+    first card, given its indexed runs
+    """
+    for top, inner_naturals, forced_wilds in runs:
+        if top not in rest:
+            continue
+        # Each inner natural card in hand may be used or replaced by a wild
+        available = [rest.index(c) for c in inner_naturals if c in rest]
+        missing = len(inner_naturals) - len(available) + forced_wilds
+        if missing > wilds:
+            continue
+        for mask in range(1 << len(available)):
+            taken = {p for bit, p in enumerate(available) if mask >> bit & 1}
+            used = missing + len(available) - len(taken)
+            if used > wilds:
+                continue
+            taken.add(rest.index(top))
+            yield used, _remove_positions(rest, taken)
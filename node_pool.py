@@ -0,0 +1,216 @@
+"""
+Compact MCTS nodes and a bounded store for them
+
+Nodes keep only the move that reaches them and their visit stats. The
+game state of a node is rebuilt during the search by replaying moves on
+one working copy of the game.
+"""
+
+import math
+import sys
+
+EVICT_SHARE = 0.1
+
+
+class Node:
+    """
+    Node of an MCTS tree
+
+    Attributes:
+        key (tuple): (source, discard) move from the parent, None at root
+        actor (int): ID of the player who made the move, None at root
+        parent (Node): The parent node
+        children (list): The expanded child nodes
+        untried (list): Moves not expanded yet, None until the node's
+            state has been rebuilt once
+        n (int): The number of times the node has been visited
+        r (float): The reward of the node
+
+    Methods:
+        best_child(): Returns the child with the best UCB value
+        visits(): Returns the visit count of every move
+    """
+
+    __slots__ = ("key", "actor", "parent", "children", "untried", "n", "r")
+
+    def __init__(self, key=None, actor=None, parent=None):
+        self.key = key
+        self.actor = actor
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.n = 0
+        self.r = 0
+
+    def best_child(self):
+        """
+        Returns the child with the best UCB value
+
+        Returns:
+            Node: Best child node
+        """
+        T = sum(child.n for child in self.children)
+        max_ucb = -float("inf")
+        max_child = None
+        for child in self.children:
+            exploitation = child.r / child.n if child.n > 0 else 0
+            exploration = math.sqrt(2 * math.log(T) / child.n) if child.n > 0 else 0
+            ucb = exploitation + exploration
+            if ucb > max_ucb:
+                max_ucb = ucb
+                max_child = child
+        return max_child
+
+    def visits(self):
+        """
+        Returns the visit count of every move, 0 for moves not expanded
+
+        Returns:
+            list: Visit counts
+        """
+        return [child.n for child in self.children] + [0] * len(self.untried or ())
+
+
+def node_bytes(node):
+    """
+    Get bytes held by a node and its lists, not counting shared moves
+    """
+    return (
+        sys.getsizeof(node)
+        + sys.getsizeof(node.children)
+        + (sys.getsizeof(node.untried) if node.untried is not None else 0)
+    )
+
+
+def walk(root):
+    """
+    Yield every node of the tree under root, root first
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.children)
+
+
+class NodePool:
+    """
+    Node store for one search, bounded by evicting the least visited leaves
+
+    Children of the root are never evicted, so the root decision keeps
+    all its stats. An evicted leaf's move goes back to its parent's
+    untried moves and can be expanded again.
+
+    Attributes:
+        max_nodes (int): Maximum number of nodes, None for no limit
+        size (int): Number of nodes in the tree
+        peak (int): Largest size reached
+        created (int): Number of nodes added
+        evicted (int): Number of nodes evicted
+
+    Methods:
+        adopt(root): Count the nodes of an existing tree
+        add(parent, key, actor): Add a child node
+        full(): Check if the pool has reached max_nodes
+        evict(root): Evict the least visited leaves
+        stats(root): Return counters and memory use
+    """
+
+    def __init__(self, max_nodes=None):
+        if max_nodes is not None and max_nodes < 1:
+            raise ValueError("max_nodes must be at least 1")
+        self.max_nodes = max_nodes
+        self.size = 0
+        self.peak = 0
+        self.created = 0
+        self.evicted = 0
+
+    def adopt(self, root):
+        """
+        Count the nodes of an existing tree
+
+        Args:
+            root (Node): Root of the tree
+        """
+        self.size = sum(1 for _ in walk(root))
+        self.peak = max(self.peak, self.size)
+
+    def add(self, parent, key, actor):
+        """
+        Add a child node
+
+        Args:
+            parent (Node): Parent node
+            key (tuple): Move from parent
+            actor (int): ID of the player who made the move
+
+        Returns:
+            Node: New child node
+        """
+        node = Node(key, actor, parent)
+        parent.children.append(node)
+        self.size += 1
+        self.created += 1
+        if self.size > self.peak:
+            self.peak = self.size
+        return node
+
+    def full(self):
+        """
+        Check if the pool has reached max_nodes
+
+        Returns:
+            bool: True if nodes should be evicted before adding more
+        """
+        return self.max_nodes is not None and self.size >= self.max_nodes
+
+    def evict(self, root):
+        """
+        Evict the least visited leaves until EVICT_SHARE of max_nodes is
+        free, or no leaf below the root's children is left
+
+        Args:
+            root (Node): Root of the tree
+        """
+        target = self.max_nodes - max(1, int(self.max_nodes * EVICT_SHARE))
+        while self.size > target:
+            leaves = [
+                node
+                for node in walk(root)
+                if not node.children and node.parent is not None
+                and node.parent is not root
+            ]
+            if not leaves:
+                return
+            leaves.sort(key=lambda node: node.n)
+            for node in leaves[: self.size - target]:
+                parent = node.parent
+                parent.children.remove(node)
+                parent.untried.insert(0, node.key)
+                node.parent = None
+                self.size -= 1
+                self.evicted += 1
+
+    def stats(self, root):
+        """
+        Return counters and memory use
+
+        Peak bytes are estimated from the average size of the nodes left
+        at the end of the search.
+
+        Args:
+            root (Node): Root of the tree
+
+        Returns:
+            dict: Live, peak, created and evicted nodes, live and peak bytes
+        """
+        live_bytes = sum(node_bytes(node) for node in walk(root))
+        per_node = live_bytes / self.size if self.size else 0
+        return dict(
+            nodes=self.size,
+            peak_nodes=self.peak,
+            created=self.created,
+            evicted=self.evicted,
+            bytes=live_bytes,
+            peak_bytes=int(self.peak * per_node),
+        )
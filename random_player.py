@@ -2,8 +2,6 @@
 Random Player class
 """
 
-import random
-
 from player import Player
 from constants import GET_DISCARD, DRAW_CARD
 
@@ -28,7 +26,7 @@ class RandomPlayer(Player):
         Returns:
             int: Action to take
         """
-        choice =  random.choice([GET_DISCARD, DRAW_CARD])
+        choice =  game.get_rng().choice([GET_DISCARD, DRAW_CARD])
         if choice == GET_DISCARD:
             self.prev_discard = game.get_discard_pile()[-1]
         else:
@@ -41,4 +39,4 @@ class RandomPlayer(Player):
         Returns:
             Card: Card to discard
         """
-        return random.choice([card for card in self.hand if card != self.prev_discard])
+        return game.get_rng().choice([card for card in self.hand if card != self.prev_discard])
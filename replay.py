@@ -0,0 +1,311 @@
+"""
+Replay buffer on preallocated ring arrays, with uniform or prioritized
+sampling
+
+Arrays can be backed by .npy files opened with np.memmap, so a buffer can
+be larger than RAM and is still there when training restarts.
+"""
+
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from dqn_env import STATE_DIM
+
+ALPHA = 0.6
+BETA = 0.4
+PRIORITY_EPS = 1e-3
+
+
+def _array(path, name, shape, dtype):
+    """
+    Zeroed array, or a .npy file in path opened in place when path is set
+    """
+    if path is None:
+        return np.zeros(shape, dtype=dtype)
+    filename = os.path.join(path, f"{name}.npy")
+    if os.path.exists(filename):
+        array = open_memmap(filename, mode="r+")
+        if array.shape != shape or array.dtype != np.dtype(dtype):
+            raise ValueError(
+                f"{filename} holds {array.dtype} {array.shape}, expected "
+                f"{np.dtype(dtype)} {shape}"
+            )
+        return array
+    return open_memmap(filename, mode="w+", dtype=dtype, shape=shape)
+
+
+class SumTree:
+    """
+    Binary tree of priority sums over a fixed number of leaves
+
+    Attributes:
+        capacity (int): Number of leaves
+        tree (np.ndarray): Node sums, root at 1 and leaves from 'leaves'
+        leaves (int): Index of the first leaf, a power of two
+
+    Methods:
+        total(): Sum of all priorities
+        get(indices): Priorities of leaves
+        update(indices, priorities): Set priorities of leaves
+        find(values, size): Leaves where cumulative priority passes values
+    """
+
+    def __init__(self, capacity, path=None):
+        self.capacity = capacity
+        self.leaves = 1 << max(0, (capacity - 1).bit_length())
+        self.tree = _array(path, "tree", (2 * self.leaves,), np.float64)
+
+    def total(self):
+        """
+        Get sum of all priorities
+
+        Returns:
+            float: Sum at the root
+        """
+        return float(self.tree[1])
+
+    def get(self, indices):
+        """
+        Get priorities of leaves
+
+        Args:
+            indices (np.ndarray): Leaf indices
+
+        Returns:
+            np.ndarray: Priorities
+        """
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def update(self, indices, priorities):
+        """
+        Set priorities of leaves and the sums above them
+
+        Args:
+            indices (np.ndarray): Leaf indices
+            priorities (np.ndarray): New priorities
+        """
+        nodes = self.leaves + np.asarray(indices)
+        self.tree[nodes] = priorities
+        # Parents shared by several leaves are just summed more than once
+        for _ in range(self.leaves.bit_length() - 1):
+            nodes //= 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values, size=None):
+        """
+        Find the leaves where the cumulative priority passes each value,
+        walking every value down the tree at once
+
+        Args:
+            values (np.ndarray): Values in [0, total())
+            size (int): Number of leaves in use, capacity if not given.
+                Rounding past the last one returns the last one.
+
+        Returns:
+            np.ndarray: Leaf indices
+        """
+        if size is None:
+            size = self.capacity
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.leaves.bit_length() - 1):
+            left = 2 * nodes
+            left_sums = self.tree[left]
+            right = values >= left_sums
+            values -= np.where(right, left_sums, 0)
+            nodes = left + right
+        return np.minimum(nodes - self.leaves, size - 1)
+
+
+class ReplayBuffer:
+    """
+    Ring buffer of transitions in preallocated arrays
+
+    With prioritized, transitions are sampled in proportion to
+    priority ** alpha, and new transitions get the highest priority seen
+    so far. Otherwise sampling is uniform.
+
+    Attributes:
+        capacity (int): Maximum number of transitions
+        prioritized (bool): Sample by priority
+        alpha (float): How strongly priorities skew sampling
+        states (np.ndarray): (capacity x state_dim) states
+        actions (np.ndarray): Action of each transition
+        rewards (np.ndarray): Reward of each transition
+        next_states (np.ndarray): (capacity x state_dim) next states
+        dones (np.ndarray): Whether each transition ended a game
+
+    Methods:
+        add(state, action, reward, next_state, done): Add one transition
+        add_batch(states, actions, rewards, next_states, dones): Add many
+        sample(batch_size, beta): Sample a batch
+        update_priorities(indices, errors): Set priorities from TD errors
+        size(): Number of transitions held
+        flush(): Write memory-mapped arrays to disk
+    """
+
+    def __init__(self, capacity, state_dim=STATE_DIM, prioritized=False,
+                 alpha=ALPHA, path=None, seed=None):
+        """
+        Args:
+            capacity (int): Maximum number of transitions
+            state_dim (int): Length of a state
+            prioritized (bool): Sample by priority
+            alpha (float): How strongly priorities skew sampling
+            path (str): Directory for memory-mapped arrays, None to keep
+                them in memory. A buffer saved there is reopened as is.
+            seed (int): Seed for sampling
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.states = _array(path, "states", (capacity, state_dim), np.float32)
+        self.actions = _array(path, "actions", (capacity,), np.int64)
+        self.rewards = _array(path, "rewards", (capacity,), np.float32)
+        self.next_states = _array(path, "next_states", (capacity, state_dim), np.float32)
+        self.dones = _array(path, "dones", (capacity,), np.bool_)
+        # Next position to write and number of transitions held
+        self._meta = _array(path, "meta", (2,), np.int64)
+        self._tree = SumTree(capacity, path) if prioritized else None
+        self._max_priority = 1.0
+        if self._tree is not None and self.size():
+            held = np.arange(self.size())
+            if self._tree.total() == 0:
+                # Buffer saved without priorities, start them all equal
+                self._tree.update(held, np.ones(len(held)))
+            self._max_priority = max(1.0, float(self._tree.get(held).max()))
+        self._rng = np.random.default_rng(seed)
+
+    def size(self):
+        """
+        Get number of transitions held
+
+        Returns:
+            int: Number of transitions
+        """
+        return int(self._meta[1])
+
+    def __len__(self):
+        return self.size()
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Add one transition, overwriting the oldest when full
+
+        Args:
+            state (np.ndarray): State
+            action (int): Action taken
+            reward (float): Reward
+            next_state (np.ndarray): State after the action
+            done (bool): Whether the game ended
+        """
+        self.add_batch(
+            np.asarray(state)[None], [action], [reward], np.asarray(next_state)[None], [done]
+        )
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Add transitions in order, overwriting the oldest when full
+
+        Args:
+            states (np.ndarray): (n x state_dim) states
+            actions (np.ndarray): Actions taken
+            rewards (np.ndarray): Rewards
+            next_states (np.ndarray): (n x state_dim) states after the actions
+            dones (np.ndarray): Whether each game ended
+        """
+        n = len(states)
+        if n == 0:
+            return
+        if n > self.capacity:
+            return self.add_batch(
+                states[-self.capacity :], actions[-self.capacity :],
+                rewards[-self.capacity :], next_states[-self.capacity :],
+                dones[-self.capacity :],
+            )
+        position = int(self._meta[0])
+        indices = (position + np.arange(n)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        if self._tree is not None:
+            self._tree.update(indices, np.full(n, self._max_priority))
+        self._meta[0] = (position + n) % self.capacity
+        self._meta[1] = min(self.capacity, self.size() + n)
+
+    def sample(self, batch_size, beta=BETA):
+        """
+        Sample a batch of transitions
+
+        Prioritized samples take one value from each of batch_size equal
+        slices of the total priority.
+
+        Args:
+            batch_size (int): Number of transitions
+            beta (float): How much importance weights undo the
+                prioritized sampling, 1 for fully
+
+        Returns:
+            tuple: states, actions, rewards, next states, dones, indices
+                and importance weights, all 1 for uniform sampling
+        """
+        size = self.size()
+        if size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        if self._tree is None:
+            indices = self._rng.integers(0, size, batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            total = self._tree.total()
+            if total <= 0:
+                raise ValueError("Replay buffer priorities sum to 0")
+            values = (np.arange(batch_size) + self._rng.random(batch_size)) * (
+                total / batch_size
+            )
+            indices = self._tree.find(values, size)
+            probs = self._tree.get(indices) / total
+            weights = (size * probs) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+        return (
+            self.states[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_states[indices],
+            self.dones[indices],
+            indices,
+            weights,
+        )
+
+    def update_priorities(self, indices, errors):
+        """
+        Set priorities of sampled transitions from their TD errors
+
+        Args:
+            indices (np.ndarray): Indices returned by sample
+            errors (np.ndarray): TD error of each transition
+        """
+        if self._tree is None:
+            return
+        priorities = (np.abs(errors) + PRIORITY_EPS) ** self.alpha
+        self._tree.update(indices, priorities)
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+
+    def flush(self):
+        """
+        Write memory-mapped arrays to disk, nothing to do in memory
+        """
+        arrays = [self.states, self.actions, self.rewards, self.next_states,
+                  self.dones, self._meta]
+        if self._tree is not None:
+            arrays.append(self._tree.tree)
+        for array in arrays:
+            if isinstance(array, np.memmap):
+                array.flush()
@@ -0,0 +1,341 @@
+"""
+Fast rollouts for MCTS on a compact copy of a game
+
+Cards are card indices, and every per-card lookup comes from tables built
+once per epoch. The going out check runs the meld solver only when no
+card in hand rules it out.
+"""
+
+import random
+import time
+
+from deck import JOKER_INDEX, MIN_RANK, NUM_RANKS
+from meld_index import get_index
+from scoring import score_indices
+
+DEPTH = 20
+NEAR = 2
+
+_TABLES = {}
+
+
+class RolloutTables:
+    """
+    Per-epoch lookup tables for rollouts
+
+    Attributes:
+        epoch (int): Epoch the tables were built for
+        values (list): Score value of each card index
+        is_wild (tuple): Whether each card index is wild
+        same_rank (list): Bitmask of non-wild cards of the same rank,
+            including the card itself so a second copy counts
+        same_suit (list): For each card index, bitmasks of non-wild cards
+            of the same suit within d ranks, for d = 0 .. NUM_RANKS
+    """
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self.is_wild = get_index(epoch).is_wild
+        self.values = [c % NUM_RANKS + MIN_RANK for c in range(JOKER_INDEX)] + [50]
+        self.same_rank = [0] * (JOKER_INDEX + 1)
+        self.same_suit = [[0] * (NUM_RANKS + 1) for _ in range(JOKER_INDEX + 1)]
+        for c in range(JOKER_INDEX):
+            if self.is_wild[c]:
+                continue
+            suit, rank = divmod(c, NUM_RANKS)
+            for other in range(JOKER_INDEX):
+                if self.is_wild[other]:
+                    continue
+                other_suit, other_rank = divmod(other, NUM_RANKS)
+                if other_rank == rank:
+                    self.same_rank[c] |= 1 << other
+                elif other_suit == suit:
+                    for d in range(abs(other_rank - rank), NUM_RANKS + 1):
+                        self.same_suit[c][d] |= 1 << other
+
+    def partial_meld(self, card, mask, gap=NEAR):
+        """
+        Check if a non-wild card has a same rank card, or a same suit card
+        within gap ranks, in mask
+
+        Args:
+            card (int): Card index
+            mask (int): Bitmask of other non-wild cards
+            gap (int): Largest rank distance for same suit cards
+
+        Returns:
+            bool: True if card forms a partial meld
+        """
+        return bool((self.same_rank[card] | self.same_suit[card][gap]) & mask)
+
+
+def get_tables(epoch):
+    """
+    Get rollout tables for epoch, building them on first use
+
+    Args:
+        epoch (int): Epoch number
+
+    Returns:
+        RolloutTables: Tables shared by every rollout in the process
+    """
+    tables = _TABLES.get(epoch)
+    if tables is None:
+        tables = RolloutTables(epoch)
+        _TABLES[epoch] = tables
+    return tables
+
+
+def natural_mask(hand, tables, skip=None):
+    """
+    Bitmask of the non-wild cards in hand, leaving out position skip
+    """
+    mask = 0
+    for i, c in enumerate(hand):
+        if i != skip and not tables.is_wild[c]:
+            mask |= 1 << c
+    return mask
+
+
+def can_go_out(hand, tables):
+    """
+    Check if hand scores 0, skipping the meld solver when some card
+    cannot be in any meld
+
+    A non-wild card with no same rank card and no same suit card within
+    reach of the wilds can only be in a book with two wild cards.
+
+    Args:
+        hand (list): Card indices in hand
+        tables (RolloutTables): Tables for the epoch
+
+    Returns:
+        bool: True if hand scores 0
+    """
+    wilds = sum(1 for c in hand if tables.is_wild[c])
+    gap = min(wilds + 1, NUM_RANKS)
+    isolated = 0
+    for i, c in enumerate(hand):
+        if tables.is_wild[c]:
+            continue
+        if not tables.partial_meld(c, natural_mask(hand, tables, skip=i), gap):
+            isolated += 1
+            if 2 * isolated > wilds:
+                return False
+    return score_indices(hand, tables.epoch) == 0
+
+
+class RandomRollout:
+    """
+    Rollout policy that plays like RandomPlayer
+    """
+
+    def draw_phase(self, hand, top, tables, rng):
+        """
+        Returns:
+            bool: True to take the discard, False to draw from deck
+        """
+        return rng.random() < 0.5 and any(c != top for c in hand)
+
+    def discard_phase(self, hand, taken, tables, rng):
+        """
+        Returns:
+            int: Position in hand to discard
+        """
+        options = [i for i, c in enumerate(hand) if c != taken]
+        return rng.choice(options)
+
+
+class HeuristicRollout:
+    """
+    Rollout policy that takes the discard if it forms a partial meld and
+    discards the highest card not in a partial meld, never a wild card
+    """
+
+    def draw_phase(self, hand, top, tables, rng):
+        """
+        Returns:
+            bool: True to take the discard, False to draw from deck
+        """
+        if not any(c != top for c in hand):
+            return False
+        if tables.is_wild[top]:
+            return True
+        return tables.partial_meld(top, natural_mask(hand, tables))
+
+    def discard_phase(self, hand, taken, tables, rng):
+        """
+        Returns:
+            int: Position in hand to discard
+        """
+        best = None
+        best_key = None
+        for i, c in enumerate(hand):
+            if c == taken:
+                continue
+            if tables.is_wild[c]:
+                key = (-1, 0)
+            else:
+                loose = not tables.partial_meld(c, natural_mask(hand, tables, skip=i))
+                key = (int(loose), tables.values[c])
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+        return best
+
+
+ROLLOUT_POLICIES = {
+    "random": RandomRollout(),
+    "heuristic": HeuristicRollout(),
+}
+
+
+class RolloutGame:
+    """
+    Compact copy of a game that only supports playing turns
+
+    Attributes:
+        hands (list): Card indices in each player's hand
+        deck (list): Card indices in deck, next card last
+        pile (list): Card indices in discard pile, top card last
+        active (int): ID of player to move
+        go_out (bool): Whether a player has gone out
+        remaining (int): Players that have not revealed hands
+        game_over (bool): Whether the game is over
+        tables (RolloutTables): Tables for the epoch
+
+    Methods:
+        from_game(game): Copy a Game
+        play_turn(policy, rng): Play the active player's turn
+        partial_scores(): Heuristic score of every hand
+    """
+
+    __slots__ = (
+        "hands",
+        "deck",
+        "pile",
+        "active",
+        "go_out",
+        "remaining",
+        "game_over",
+        "tables",
+    )
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Copy a Game
+
+        Args:
+            game (Game): Game object
+
+        Returns:
+            RolloutGame: Compact copy
+        """
+        sim = cls()
+        sim.hands = [
+            [c.index() for c in game.get_player_hand(i)]
+            for i in range(game.num_players())
+        ]
+        sim.deck = [c.index() for c in game.get_deck().get_cards()]
+        sim.pile = [c.index() for c in game.get_discard_pile()]
+        sim.active = game.get_active_player()
+        sim.go_out = game.is_going_out()
+        sim.remaining = game.get_remaining_players()
+        sim.game_over = game.is_game_over()
+        sim.tables = get_tables(game.get_epoch())
+        return sim
+
+    def play_turn(self, policy, rng):
+        """
+        Play the active player's turn, following Game.play_round
+
+        Args:
+            policy: Rollout policy
+            rng (random.Random): Random generator
+        """
+        if not self.deck:
+            self.game_over = True
+            return
+        if self.game_over:
+            return
+
+        # Draw Phase
+        hand = self.hands[self.active]
+        taken = None
+        if self.pile and policy.draw_phase(hand, self.pile[-1], self.tables, rng):
+            taken = self.pile.pop()
+            hand.append(taken)
+        else:
+            hand.append(self.deck.pop())
+
+        # Discard Phase
+        self.pile.append(hand.pop(policy.discard_phase(hand, taken, self.tables, rng)))
+
+        # Go out Phase
+        if not self.deck:
+            self.game_over = True
+        if self.go_out:
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.game_over = True
+        elif can_go_out(hand, self.tables):
+            self.remaining -= 1
+            self.go_out = True
+
+        self.active = (self.active + 1) % len(self.hands)
+
+    def partial_scores(self):
+        """
+        Heuristic score of every hand, like mcts.partial_score
+
+        Returns:
+            list: Partial score of each player
+        """
+        scores = []
+        for hand in self.hands:
+            score = score_indices(hand, self.tables.epoch)
+            scores.append((100 if score == 0 else 0) - score)
+        return scores
+
+
+def rollout(game, policy="random", rng=None, depth=DEPTH):
+    """
+    Play up to depth turns of a copy of game and score every hand
+
+    Args:
+        game (Game): Game object, left unchanged
+        policy (str): Name of a policy in ROLLOUT_POLICIES
+        rng (random.Random): Random generator, fresh one if None
+        depth (int): Maximum number of turns
+
+    Returns:
+        list: Partial score of each player
+    """
+    rng = rng if rng is not None else random.Random()
+    policy = ROLLOUT_POLICIES[policy]
+    sim = RolloutGame.from_game(game)
+    for _ in range(depth):
+        if sim.game_over:
+            break
+        sim.play_turn(policy, rng)
+    return sim.partial_scores()
+
+
+def benchmark(game, policy="random", rollouts=1000, seed=0):
+    """
+    Measure rollouts per second of process CPU time from game
+
+    Args:
+        game (Game): Game object
+        policy (str): Name of a policy in ROLLOUT_POLICIES
+        rollouts (int): Number of rollouts to run
+        seed (int): Seed for the rollouts
+
+    Returns:
+        float: Rollouts per second
+    """
+    rng = random.Random(seed)
+    start = time.process_time()
+    for _ in range(rollouts):
+        rollout(game, policy, rng)
+    return rollouts / max(time.process_time() - start, 1e-9)
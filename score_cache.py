@@ -0,0 +1,109 @@
+"""
+Bounded LRU cache for hand scores
+"""
+
+from collections import OrderedDict
+
+DEFAULT_SIZE = 1 << 16
+
+
+class ScoreCache:
+    """
+    Least recently used cache of hand scores
+
+    Attributes:
+        max_size (int): Maximum number of cached scores
+        hits (int): Number of lookups found in cache
+        misses (int): Number of lookups not found in cache
+        evictions (int): Number of scores dropped to stay under max_size
+
+    Methods:
+        get(key): Return cached score or None
+        put(key, score): Cache score for key
+        resize(max_size): Change maximum size, evicting if needed
+        clear(): Drop all scores and reset counters
+        stats(): Return counters and hit rate
+    """
+
+    def __init__(self, max_size=DEFAULT_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scores = OrderedDict()
+
+    def get(self, key):
+        """
+        Return cached score for key
+
+        Args:
+            key (tuple): Hand key
+
+        Returns:
+            int: Cached score, or None if not cached
+        """
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key, score):
+        """
+        Cache score for key, evicting least recently used scores
+
+        Args:
+            key (tuple): Hand key
+            score (int): Score of hand
+        """
+        if self.max_size <= 0:
+            return
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        self._evict()
+
+    def resize(self, max_size):
+        """
+        Change maximum size of cache
+
+        Args:
+            max_size (int): New maximum number of cached scores
+        """
+        self.max_size = max_size
+        self._evict()
+
+    def clear(self):
+        """
+        Drop all scores and reset counters
+        """
+        self._scores.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Return cache counters
+
+        Returns:
+            dict: Size, hits, misses, evictions and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._scores),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _evict(self):
+        while len(self._scores) > max(self.max_size, 0):
+            self._scores.popitem(last=False)
+            self.evictions += 1
@@ -1,8 +1,14 @@
 """
-Scoring function for epochs 3 to 5
+Scoring functions for epochs 3 to 13
 """
 
-import itertools as it
+from deck import JOKER_INDEX, MIN_RANK, NUM_RANKS
+from meld_index import get_index
+from meld_solver import MeldSolver
+from score_cache import ScoreCache
+
+# Shared by every Game in the process
+SCORE_CACHE = ScoreCache()
 
 
 def get_best_discard(hand, game, excluded_discard=None):
@@ -19,14 +25,12 @@ def get_best_discard(hand, game, excluded_discard=None):
     """
     best_score = float("inf")
     best_discard = None
+    scores = leave_one_out_scores(hand, game, keep_wild=(not game.is_going_out()))
 
     # Find best discard
-    for i, card in enumerate(hand):
+    for card, score in zip(hand, scores):
         if excluded_discard and card == excluded_discard:
             continue
-        score = score_hand(
-            hand[:i] + hand[i + 1 :], game, keep_wild=(not game.is_going_out())
-        )
         if score < best_score:
             best_score = score
             best_discard = card
@@ -34,6 +38,50 @@ def get_best_discard(hand, game, excluded_discard=None):
     return best_discard, best_score
 
 
+def leave_one_out_scores(hand, game, keep_wild=False):
+    """
+    Get lowest score of the hand left after removing each card, sharing
+    one meld search between all of them
+
+    Args:
+        hand (list): List of cards in hand
+        game (Game): Game object
+        keep_wild (bool): Score wild cards as 0
+
+    Returns:
+        list: Score of hand without card i for each position i
+    """
+    epoch = game.get_epoch()
+    naturals, wild_values = _split_hand(hand, game, keep_wild)
+    indices = sorted(card.index() for card in hand)
+    index = get_index(epoch)
+    solver = MeldSolver(index)
+
+    # Copies of the same card leave the same hand
+    scores_by_index = {}
+    scores = []
+    for card in hand:
+        card_idx = card.index()
+        if card_idx not in scores_by_index:
+            others = list(indices)
+            others.remove(card_idx)
+            key = (tuple(others), epoch, keep_wild)
+            score = SCORE_CACHE.get(key)
+            if score is None:
+                if index.is_wild[card_idx]:
+                    others_wild = list(wild_values)
+                    others_wild.remove(_wild_value(card, game, keep_wild))
+                    score = solver.min_score(naturals, others_wild)
+                else:
+                    others_natural = list(naturals)
+                    others_natural.remove(card_idx)
+                    score = solver.min_score(others_natural, wild_values)
+                SCORE_CACHE.put(key, score)
+            scores_by_index[card_idx] = score
+        scores.append(scores_by_index[card_idx])
+    return scores
+
+
 def scoring_set(hand, game):
     """
     Checks if a set does have 0 score
@@ -45,60 +93,120 @@ def scoring_set(hand, game):
     Returns:
         bool: True if hand is a scoring set else False
     """
-    # Count wild cards and non-wild cards
+    index = get_index(game.get_epoch())
+    naturals = []
     wild_card_count = 0
-    cards_without_wild = []
     for card in hand:
-        if card.suit() == "J" or card.rank() == game.get_epoch():
+        card_idx = card.index()
+        if index.is_wild[card_idx]:
             wild_card_count += 1
         else:
-            cards_without_wild.append(card)
-
-    # Check if hand is a book
-    if len(set([c.rank() for c in cards_without_wild])) == 1:
-        return True
+            naturals.append(card_idx)
+    naturals.sort()
 
-    # Check if hand is a run
-    if len(set([c.suit() for c in cards_without_wild])) == 1:
-        ranks = [c.rank() for c in cards_without_wild]
-
-        # Same suit: Check if max-min = hand size - 1
-        if max(ranks) - min(ranks) == len(hand) - 1:
-            # Check if wild cards + non-wild cards form a run
-            if len(set(ranks)) + wild_card_count == len(hand):
-                return True
-    return False
+    return index.is_meld(naturals, wild_card_count)
 
 
 def score_hand(hand, game, keep_wild=False):
     """
-    Get lowest score of a hand for epochs 3 to 5
+    Get lowest score of a hand over all disjoint books and runs
 
     Args:
         hand (list): List of cards in hand
         game (Game): Game object
+        keep_wild (bool): Score wild cards as 0
+
+    Returns:
+        int: Lowest possible score
+    """
+    epoch = game.get_epoch()
+    indices = sorted(card.index() for card in hand)
+    key = (tuple(indices), epoch, keep_wild)
+    score = SCORE_CACHE.get(key)
+    if score is not None:
+        return score
+
+    naturals, wild_values = _split_hand(hand, game, keep_wild)
+    score = MeldSolver(get_index(epoch)).min_score(naturals, wild_values)
+    SCORE_CACHE.put(key, score)
+    return score
+
+
+def score_indices(indices, epoch, keep_wild=False, solver=None):
+    """
+    Get lowest score of a hand given as card indices, sharing the cache
+    with score_hand
+
+    Args:
+        indices (list): Card index of every card in hand
+        epoch (int): Epoch number
+        keep_wild (bool): Score wild cards as 0
+        solver (MeldSolver): Solver of the epoch to reuse across calls,
+            a new one if None
 
     Returns:
         int: Lowest possible score
     """
+    indices = sorted(indices)
+    key = (tuple(indices), epoch, keep_wild)
+    score = SCORE_CACHE.get(key)
+    if score is not None:
+        return score
+
+    # Same values as Game.card_value: a card's rank, 50 for jokers
+    index = get_index(epoch)
+    naturals = [c for c in indices if not index.is_wild[c]]
+    wild_values = [
+        0 if keep_wild else 50 if c == JOKER_INDEX else c % NUM_RANKS + MIN_RANK
+        for c in indices
+        if index.is_wild[c]
+    ]
+    if solver is None:
+        solver = MeldSolver(index)
+    score = solver.min_score(naturals, wild_values)
+    SCORE_CACHE.put(key, score)
+    return score
+
+
+def set_cache_size(max_size):
+    """
+    Set maximum number of cached hand scores
+
+    Args:
+        max_size (int): Maximum cache size, 0 to disable caching
+    """
+    SCORE_CACHE.resize(max_size)
+
+
+def cache_stats():
+    """
+    Get hit, miss and eviction counts of the score cache
 
-    # Score a card
-    def score_card(card):
-        if keep_wild:
-            if card.suit() == "J" or card.rank() == game.get_epoch():
-                return 0
-        return game.card_value(card)
+    Returns:
+        dict: Cache statistics
+    """
+    return SCORE_CACHE.stats()
 
-    lowest_score = sum(score_card(c) for c in hand)
 
-    # Try every possible scoring subset for best score
-    for window_size in range(3, game.get_epoch() + 1):
-        subsets = it.combinations(hand, window_size)
-        for subset in subsets:
-            if scoring_set(subset, game):
-                # Remove scoring subset
-                score = sum(score_card(c) for c in hand if c not in subset)
-                if score < lowest_score:
-                    lowest_score = score
+def _wild_value(card, game, keep_wild):
+    """
+    Score value of a wild card
+    """
+    return 0 if keep_wild else game.card_value(card)
+
 
-    return lowest_score
+def _split_hand(hand, game, keep_wild):
+    """
+    Split hand into sorted non-wild card indices and wild card values
+    """
+    index = get_index(game.get_epoch())
+    naturals = []
+    wild_values = []
+    for card in hand:
+        card_idx = card.index()
+        if index.is_wild[card_idx]:
+            wild_values.append(_wild_value(card, game, keep_wild))
+        else:
+            naturals.append(card_idx)
+    naturals.sort()
+    return naturals, wild_values
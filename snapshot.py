@@ -0,0 +1,220 @@
+"""
+Immutable, Zobrist-hashed snapshots of a game for transposition tables
+"""
+
+import random
+
+from deck import NUM_CARD_IDS
+from constants import GET_DISCARD
+
+MAX_PLAYERS = 7
+MAX_COPIES = 8
+DECK_OWNER = MAX_PLAYERS
+
+# Fixed seed so hashes are the same in every process
+_rng = random.Random(0x5EED)
+_CARD_KEYS = [
+    [[_rng.getrandbits(64) for _ in range(MAX_COPIES)] for _ in range(NUM_CARD_IDS)]
+    for _ in range(MAX_PLAYERS + 1)
+]
+_DISCARD_KEYS = [_rng.getrandbits(64) for _ in range(NUM_CARD_IDS + 1)]
+_ACTIVE_KEYS = [_rng.getrandbits(64) for _ in range(MAX_PLAYERS)]
+_REMAINING_KEYS = [_rng.getrandbits(64) for _ in range(MAX_PLAYERS + 1)]
+_GO_OUT_KEY = _rng.getrandbits(64)
+_GAME_OVER_KEY = _rng.getrandbits(64)
+
+
+class GameSnapshot:
+    """
+    Compact, hashable view of everything that decides a game's future
+
+    Attributes:
+        hands (tuple): Count of each card id in each player's hand
+        deck (tuple): Count of each card id left in the deck
+        discard_top (int): Card id on top of discard pile, or 56 if empty
+        active_player (int): ID of player to move
+        go_out (bool): Whether a player has gone out
+        remaining_players (int): Players that have not revealed hands
+        game_over (bool): Whether the game is over
+
+    Methods:
+        from_game(game): Build a snapshot from a Game
+        after_move(...): Snapshot after a move, updating the hash in place
+    """
+
+    __slots__ = (
+        "hands",
+        "deck",
+        "discard_top",
+        "active_player",
+        "go_out",
+        "remaining_players",
+        "game_over",
+        "_hash",
+    )
+
+    def __init__(self, hands, deck, discard_top, active_player, go_out,
+                 remaining_players, game_over, hash_value):
+        self.hands = hands
+        self.deck = deck
+        self.discard_top = discard_top
+        self.active_player = active_player
+        self.go_out = go_out
+        self.remaining_players = remaining_players
+        self.game_over = game_over
+        self._hash = hash_value
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Build a snapshot from a game, hashing it from scratch
+
+        Args:
+            game (Game): Game object
+
+        Returns:
+            GameSnapshot: Snapshot of the game
+        """
+        hands = tuple(
+            _counts(game.get_player_hand(i)) for i in range(game.num_players())
+        )
+        deck = _counts(game.get_deck().get_cards())
+        pile = game.get_discard_pile()
+        discard_top = pile[-1].index() if pile else NUM_CARD_IDS
+
+        hash_value = 0
+        for owner, counts in enumerate(hands):
+            hash_value ^= _owner_hash(owner, counts)
+        hash_value ^= _owner_hash(DECK_OWNER, deck)
+        hash_value ^= _state_hash(
+            discard_top,
+            game.get_active_player(),
+            game.is_going_out(),
+            game.get_remaining_players(),
+            game.is_game_over(),
+        )
+        return cls(
+            hands,
+            deck,
+            discard_top,
+            game.get_active_player(),
+            game.is_going_out(),
+            game.get_remaining_players(),
+            game.is_game_over(),
+            hash_value,
+        )
+
+    def after_move(self, player_id, source, card, discard, active_player,
+                   go_out, remaining_players, game_over):
+        """
+        Snapshot after player_id takes card and discards, XORing only the
+        keys that changed
+
+        Args:
+            player_id (int): ID of player that moved
+            source (int): DRAW_CARD or GET_DISCARD
+            card (Card): Card taken, None if player only discards
+            discard (Card): Card discarded
+            active_player (int): ID of player to move next
+            go_out (bool): Going out state after the move
+            remaining_players (int): Remaining players after the move
+            game_over (bool): Game over state after the move
+
+        Returns:
+            GameSnapshot: New snapshot
+        """
+        hash_value = self._hash ^ _state_hash(
+            self.discard_top,
+            self.active_player,
+            self.go_out,
+            self.remaining_players,
+            self.game_over,
+        )
+        hand = list(self.hands[player_id])
+        deck = self.deck
+
+        if card is not None:
+            taken = card.index()
+            if source != GET_DISCARD:
+                deck = list(deck)
+                hash_value ^= _change(DECK_OWNER, deck, taken, -1)
+                deck = tuple(deck)
+            hash_value ^= _change(player_id, hand, taken, 1)
+        hash_value ^= _change(player_id, hand, discard.index(), -1)
+
+        hash_value ^= _state_hash(
+            discard.index(), active_player, go_out, remaining_players, game_over
+        )
+        hands = self.hands[:player_id] + (tuple(hand),) + self.hands[player_id + 1 :]
+        return GameSnapshot(
+            hands,
+            deck,
+            discard.index(),
+            active_player,
+            go_out,
+            remaining_players,
+            game_over,
+            hash_value,
+        )
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, GameSnapshot):
+            return False
+        return (
+            self._hash == other._hash
+            and self.hands == other.hands
+            and self.deck == other.deck
+            and self.discard_top == other.discard_top
+            and self.active_player == other.active_player
+            and self.go_out == other.go_out
+            and self.remaining_players == other.remaining_players
+            and self.game_over == other.game_over
+        )
+
+
+def _counts(cards):
+    """
+    Count of each card id in a list of cards
+    """
+    counts = [0] * NUM_CARD_IDS
+    for card in cards:
+        counts[card.index()] += 1
+    return tuple(counts)
+
+
+def _owner_hash(owner, counts):
+    """
+    Zobrist hash of one owner's card counts
+    """
+    keys = _CARD_KEYS[owner]
+    hash_value = 0
+    for card_idx, count in enumerate(counts):
+        if count:
+            hash_value ^= keys[card_idx][count]
+    return hash_value
+
+
+def _change(owner, counts, card_idx, delta):
+    """
+    Change a count in place and return the XOR that updates the hash
+    """
+    keys = _CARD_KEYS[owner][card_idx]
+    old = counts[card_idx]
+    counts[card_idx] = old + delta
+    return (keys[old] if old else 0) ^ (keys[old + delta] if old + delta else 0)
+
+
+def _state_hash(discard_top, active_player, go_out, remaining_players, game_over):
+    """
+    Zobrist hash of the non-card parts of a snapshot
+    """
+    hash_value = _DISCARD_KEYS[discard_top] ^ _ACTIVE_KEYS[active_player]
+    hash_value ^= _REMAINING_KEYS[remaining_players]
+    if go_out:
+        hash_value ^= _GO_OUT_KEY
+    if game_over:
+        hash_value ^= _GAME_OVER_KEY
+    return hash_value
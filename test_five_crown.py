@@ -2,28 +2,45 @@
 Test script for Five Crowns
 """
 import argparse
+import importlib
 
-from multiprocessing import Pool
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 from five_crowns import Game
 from scoring import score_hand
-from greedy import GreedyPlayer
-from dqn_player import DQNPlayer
-from mcts_player import MCTSPlayer
-from random_player import RandomPlayer
 
 PLAYERS = 4
 EPOCH = 4
 THREADS = 8
 
+# Agent name mapped to (module, class, keyword arguments), imported only
+# when the agent plays
 AGENT_MAP = {
-    "greedy": GreedyPlayer,
-    "mcts": MCTSPlayer,
-    "random": RandomPlayer,
-    "dqn": DQNPlayer,
+    "greedy": ("greedy", "GreedyPlayer", {}),
+    "mcts": ("mcts_player", "MCTSPlayer", {}),
+    "ismcts": ("mcts_player", "MCTSPlayer", {"ismcts": True}),
+    "random": ("random_player", "RandomPlayer", {}),
+    "dqn": ("dqn_player", "DQNPlayer", {}),
 }
 
 
+def load_agent(name, **kwargs):
+    """
+    Import an agent's module and return its player constructor
+
+    Args:
+        name (str): Key of AGENT_MAP
+        **kwargs: Keyword arguments for the player, on top of the map's
+
+    Returns:
+        functools.partial: Constructor taking the player ID
+    """
+    module, cls, defaults = AGENT_MAP[name]
+    player_cls = getattr(importlib.import_module(module), cls)
+    return partial(player_cls, **defaults, **kwargs)
+
+
 def parse_args():
     """
     Parse command line arguments
@@ -33,8 +50,20 @@ def parse_args():
     parser.add_argument("--iters", type=int, default=100)
     parser.add_argument("--agent", type=str, default="greedy")
     parser.add_argument("--opponent", type=str, default="random")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--search-workers", type=int, default=1)
+    parser.add_argument("--time-bank", type=float, default=None)
+    parser.add_argument("--search-iters", type=int, default=None)
+    parser.add_argument("--rollout", type=str, default="random")
+    parser.add_argument("--early-stop", action="store_true")
+    parser.add_argument("--max-nodes", type=int, default=None)
+    parser.add_argument("--no-widening", action="store_true")
 
     args_out = parser.parse_args()
+    # ISMCTS has no node cap or widening, so these would be ignored
+    tree_options = args_out.max_nodes is not None or args_out.no_widening
+    if tree_options and "mcts" not in (args_out.agent, args_out.opponent):
+        parser.error("--max-nodes and --no-widening only apply to the mcts agent")
 
     return args_out
 
@@ -42,34 +71,69 @@ def parse_args():
 def simulate_one_game(args):
     """
     Simulate one game with given parameters
-    Return player 1 score
+    Return player 1 score and search time saved
 
     Args:
-        args (tuple): Tuple of (agents, epoch)
+        args (tuple): Tuple of (agents, epoch, seed, game number)
 
     Returns:
-        int: Score of player 1
+        tuple: Score of player 1, seconds of MCTS search time saved
     """
-    agents, epoch = args
+    agents, epoch, seed, game_number = args
     players = [(agents[i])(i) for i in range(len(agents))]
-    game = Game(players=players, epoch=epoch)
+    game = Game(players=players, epoch=epoch, seed=seed, stream=(epoch, game_number))
     game.initialize_game()
 
     while not game.is_game_over():
         game.play_round()
 
     score = score_hand(players[0].hand, game)
+    saved = sum(p.time_bank.saved() for p in players if hasattr(p, "time_bank"))
 
-    return score
+    return score, saved
 
 
 if __name__ == "__main__":
     args = parse_args()
 
-    agent_policies = [AGENT_MAP[args.agent]] + [AGENT_MAP[args.opponent] for i in range(1, PLAYERS)]
+    search_args = dict(
+        time_bank=args.time_bank, iterations=args.search_iters, rollout=args.rollout,
+        early_stop=args.early_stop,
+    )
+    mcts_args = dict(search_args, workers=args.search_workers)
+    if args.max_nodes is not None:
+        mcts_args["max_nodes"] = args.max_nodes
+    if args.no_widening:
+        mcts_args["widening"] = None
+    agent_args = {"mcts": mcts_args, "ismcts": search_args}
+    agents = {
+        name: load_agent(name, **agent_args.get(name, {}))
+        for name in {args.agent, args.opponent}
+    }
+
+    # Games and MCTS search workers share THREADS cores
+    search_workers = args.search_workers if "mcts" in (args.agent, args.opponent) else 1
+    game_workers = max(1, THREADS // search_workers)
+
+    agent_policies = [agents[args.agent]] + [agents[args.opponent] for i in range(1, PLAYERS)]
+    if "dqn" in agents:
+        from dqn_registry import preload
+
+        # Load each model once here, so forked game workers share it
+        preload(range(3, 6))
     for epoch_number in range(3, 6):
-        with Pool(processes=THREADS) as pool:
-            scores = pool.map(simulate_one_game, [(agent_policies,epoch_number)] * args.iters)
+        # Executor workers are not daemons, so MCTS can start its own pool
+        with ProcessPoolExecutor(max_workers=game_workers) as pool:
+            results = list(pool.map(
+                simulate_one_game,
+                [(agent_policies, epoch_number, args.seed, i) for i in range(args.iters)],
+                chunksize=max(1, args.iters // (4 * game_workers)),
+            ))
+        scores = [score for score, _ in results]
         print(f"Game for Epoch {epoch_number}")
         print(f"Win Rate: {sum([1 for i in scores if i == 0])/args.iters}")
-        print(f"Average Score: {sum(scores)/args.iters}")
\ No newline at end of file
+        print(f"Average Score: {sum(scores)/args.iters}")
+        # Iteration budgets do not use the time bank, so nothing is saved
+        if {"mcts", "ismcts"} & {args.agent, args.opponent} and args.search_iters is None:
+            saved = sum(saved for _, saved in results) / args.iters
+            print(f"Search Time Saved per Game: {saved:.3f}s")
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""
+Lockstep simulator that plays many independent games as NumPy arrays
+
+Every game follows the same rules and random number streams as
+five_crowns.Game, so a game here with a given seed and stream ends with
+the same scores as Game(players, epoch, seed, stream) played with
+RandomPlayer and GreedyPlayer agents.
+"""
+
+import itertools as it
+
+import numpy as np
+
+from deck import Card, JOKER_INDEX, NUM_CARD_IDS, make_rng
+from constants import GET_DISCARD, DRAW_CARD
+from batch_scoring import score_batch
+from meld_index import COPIES
+from five_crowns import RANKS, SUITS, JOKERS
+
+POLICIES = ("random", "greedy", "external")
+
+
+class VectorGames:
+    """
+    Many five crowns games stored as arrays and advanced one turn at a time
+
+    All live games have the same active player, because every game starts
+    with player 0 and passes the turn once per step.
+
+    Attributes:
+        hands (np.ndarray): (N x players x epoch + 1) card ids in hand order
+        deck (np.ndarray): (N x 116) card ids, top of deck at deck_len - 1
+        deck_len (np.ndarray): Cards left in each deck
+        pile (np.ndarray): (N x 116) discard piles, top at pile_len - 1
+        pile_len (np.ndarray): Cards in each discard pile
+        unseen (np.ndarray): (N x players x 56) unseen card counts
+        prev_discard (np.ndarray): Card id the active player took from the
+            discard pile this turn, -1 if they drew from the deck
+        go_out (np.ndarray): Whether a player has gone out
+        remaining (np.ndarray): Players that have not revealed hands
+        game_over (np.ndarray): Whether each game is over
+
+    Methods:
+        step(discards): Play one turn of every live game
+        draw(): Draw Phase of one turn
+        discard(discards): Discard and Go out Phases of the turn
+        legal_discards(): Cards the active player may discard
+        run(): Play every game to the end
+        scores(): Final hand score of every player
+    """
+
+    def __init__(self, num_games, policies, epoch=3, seed=None, streams=None):
+        """
+        Deal num_games games
+
+        Args:
+            num_games (int): Number of games
+            policies (list): "random", "greedy" or "external" for each
+                player, where external players choose their own discards
+            epoch (int): Epoch number
+            seed (int): Base seed, as passed to Game
+            streams (list): Stream of each game, defaults to 0 .. N - 1
+        """
+        for policy in policies:
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown policy {policy}")
+        if streams is None:
+            streams = range(num_games)
+
+        self.policies = list(policies)
+        self.epoch = epoch
+        self.num_games = num_games
+        self.num_players = len(policies)
+        self._turn = 0
+        self._rngs = [make_rng(seed, stream) for stream in streams]
+        self.prev_discard = np.full(num_games, -1)
+        self._live = np.arange(num_games)
+        self._drawn = None
+        self._draw_scores = None
+
+        # Same starting order as Deck(RANKS, SUITS, JOKERS, 2)
+        ordered = []
+        for _ in range(COPIES):
+            ordered.extend(Card(r, s).index() for r, s in it.product(RANKS, SUITS))
+            ordered.extend([JOKER_INDEX] * JOKERS)
+        full_counts = np.bincount(ordered, minlength=NUM_CARD_IDS)
+
+        size = len(ordered)
+        self.deck = np.empty((num_games, size), dtype=np.int64)
+        self.pile = np.full((num_games, size), -1, dtype=np.int64)
+        self.hands = np.full((num_games, self.num_players, epoch + 1), -1, dtype=np.int64)
+        for g, rng in enumerate(self._rngs):
+            cards = list(ordered)
+            rng.shuffle(cards)
+            self.deck[g] = cards
+        self.deck_len = np.full(num_games, size)
+
+        # Deal from the top of the deck, like Deck.deal
+        for p in range(self.num_players):
+            top = self.deck_len[0]
+            self.hands[:, p, :epoch] = self.deck[:, top - epoch : top][:, ::-1]
+            self.deck_len -= epoch
+        self.pile[:, 0] = self.deck[:, self.deck_len[0] - 1]
+        self.pile_len = np.ones(num_games, dtype=np.int64)
+        self.deck_len -= 1
+
+        rows = np.arange(num_games)
+        self.unseen = np.tile(full_counts, (num_games, self.num_players, 1))
+        for p in range(self.num_players):
+            for i in range(epoch):
+                self.unseen[rows, p, self.hands[:, p, i]] -= 1
+            self.unseen[rows, p, self.pile[:, 0]] -= 1
+
+        self.go_out = np.zeros(num_games, dtype=bool)
+        self.remaining = np.full(num_games, self.num_players)
+        self.game_over = np.zeros(num_games, dtype=bool)
+
+    def active_player(self):
+        """
+        Return ID of the player to move in every live game
+        """
+        return self._turn % self.num_players
+
+    def step(self, discards=None):
+        """
+        Play one turn of every live game, like Game.play_round
+
+        Args:
+            discards (np.ndarray): Card id to discard in each game, needed
+                when the active player is "external"
+
+        Returns:
+            int: Number of games still live after the turn
+        """
+        if not len(self.draw()):
+            return 0
+        return self.discard(discards)
+
+    def draw(self):
+        """
+        Draw Phase of one turn in every live game. External players draw
+        like GreedyPlayer.
+
+        Returns:
+            np.ndarray: Indices of games that drew a card
+        """
+        self.game_over |= self.deck_len == 0
+        live = np.flatnonzero(~self.game_over)
+        self._live = live
+        if len(live) == 0:
+            return live
+
+        seat = self.active_player()
+        epoch = self.epoch
+        hands = self.hands[live, seat, :epoch]
+        tops = self.pile[live, self.pile_len[live] - 1]
+        deck_tops = self.deck[live, self.deck_len[live] - 1]
+
+        if self.policies[seat] == "random":
+            take = self._random_draw(live)
+            self._draw_scores = None
+        else:
+            take, self._draw_scores = self._greedy_draw(live, seat, hands, tops)
+        self.prev_discard[live] = np.where(take, tops, -1)
+
+        drawn = np.where(take, tops, deck_tops)
+        self.pile_len[live] -= take
+        self.deck_len[live] -= ~take
+        self.hands[live, seat, epoch] = drawn
+        took = live[take]
+        self.unseen[took[:, None], self._others(seat), drawn[take, None]] += 1
+        drew = live[~take]
+        self.unseen[drew, seat, drawn[~take]] -= 1
+        self._drawn = drawn
+        return live
+
+    def discard(self, discards=None):
+        """
+        Discard Phase and Go out Phase of the turn started by draw()
+
+        Args:
+            discards (np.ndarray): Card id to discard in each game, needed
+                when the active player is "external"
+
+        Returns:
+            int: Number of games still live after the turn
+        """
+        live = self._live
+        seat = self.active_player()
+        epoch = self.epoch
+        full_hands = self.hands[live, seat]
+
+        if self.policies[seat] == "greedy":
+            discards = self._greedy_discard(full_hands, self._drawn, self._draw_scores)
+        elif self.policies[seat] == "random":
+            discards = self._random_discard(live, full_hands)
+        else:
+            discards = np.asarray(discards, dtype=np.int64)[live]
+            legal = self.legal_discards()[live, discards]
+            if not legal.all():
+                raise ValueError(f"Illegal discard in games {live[~legal]}")
+
+        first = np.argmax(full_hands == discards[:, None], axis=1)
+        keep = np.arange(epoch + 1)[None, :] != first[:, None]
+        self.hands[live, seat, :epoch] = full_hands[keep].reshape(len(live), epoch)
+        self.hands[live, seat, epoch] = -1
+        self.pile[live, self.pile_len[live]] = discards
+        self.pile_len[live] += 1
+        self.unseen[live[:, None], self._others(seat), discards[:, None]] -= 1
+
+        # Go out Phase
+        self.game_over[live] |= self.deck_len[live] == 0
+        revealed = live[self.go_out[live]]
+        self.remaining[revealed] -= 1
+        self.game_over[revealed[self.remaining[revealed] == 0]] = True
+        playing = live[~self.go_out[live]]
+        if len(playing):
+            scores = score_batch(hand_counts(self.hands[playing, seat, :epoch]), epoch)
+            out = playing[scores == 0]
+            self.remaining[out] -= 1
+            self.go_out[out] = True
+
+        self._turn += 1
+        return int(np.count_nonzero(~self.game_over))
+
+    def legal_discards(self):
+        """
+        Cards the active player may discard after draw(): any card in hand
+        except one just taken from the discard pile
+
+        Returns:
+            np.ndarray: (N x 56) boolean mask, all False for finished games
+        """
+        legal = np.zeros((self.num_games, NUM_CARD_IDS), dtype=bool)
+        live = self._live
+        full_hands = self.hands[live, self.active_player()]
+        legal[live[:, None], full_hands] = True
+        taken = self.prev_discard[live]
+        took = taken >= 0
+        legal[live[took], taken[took]] = False
+        return legal
+
+    def run(self):
+        """
+        Play every game to the end
+
+        Returns:
+            np.ndarray: (N x players) final hand scores
+        """
+        while self.step():
+            pass
+        return self.scores()
+
+    def scores(self):
+        """
+        Score every player's hand without keeping wild cards
+
+        Returns:
+            np.ndarray: (N x players) hand scores
+        """
+        scores = np.empty((self.num_games, self.num_players), dtype=np.int64)
+        for p in range(self.num_players):
+            scores[:, p] = score_batch(hand_counts(self.hands[:, p, : self.epoch]), self.epoch)
+        return scores
+
+    def _score(self, counts, keep_wild):
+        """
+        Score count rows, each with its own keep_wild flag
+        """
+        scores = np.empty(len(counts), dtype=np.int64)
+        for flag in (False, True):
+            rows = keep_wild == flag
+            if rows.any():
+                scores[rows] = score_batch(counts[rows], self.epoch, keep_wild=flag)
+        return scores
+
+    def _others(self, seat):
+        """
+        IDs of every player except seat, shaped to index a row of games
+        """
+        return np.flatnonzero(np.arange(self.num_players) != seat)[None, :]
+
+    def _random_draw(self, live):
+        """
+        RandomPlayer.draw_phase for every live game
+        """
+        take = np.empty(len(live), dtype=bool)
+        for i, g in enumerate(live):
+            take[i] = self._rngs[g].choice([GET_DISCARD, DRAW_CARD]) == GET_DISCARD
+        return take
+
+    def _random_discard(self, live, full_hands):
+        """
+        RandomPlayer.discard_phase for every live game
+        """
+        discards = np.empty(len(live), dtype=np.int64)
+        for i, g in enumerate(live):
+            prev = self.prev_discard[g]
+            options = [c for c in full_hands[i].tolist() if c != prev]
+            discards[i] = self._rngs[g].choice(options)
+        return discards
+
+    def _greedy_draw(self, live, seat, hands, tops):
+        """
+        GreedyPlayer.draw_phase for every live game
+
+        Scores hand minus card i plus card u for every position i and every
+        card u that can be drawn, then reads both the discard option and
+        the expected draw score off that table.
+        """
+        n, epoch = hands.shape
+        keep_wild = ~self.go_out[live]
+        unseen = np.maximum(self.unseen[live, seat], 0)
+        base = hand_counts(hands)
+        rows = np.arange(n)
+
+        # Cards that can be added: unseen cards and the discard top
+        addable = unseen > 0
+        addable[rows, tops] = True
+        g_idx, u_idx = np.nonzero(addable)
+        g_idx = np.repeat(g_idx, epoch)
+        u_idx = np.repeat(u_idx, epoch)
+        i_idx = np.tile(np.arange(epoch), len(g_idx) // epoch)
+
+        swapped = base[g_idx]
+        swapped[np.arange(len(g_idx)), hands[g_idx, i_idx]] -= 1
+        swapped[np.arange(len(g_idx)), u_idx] += 1
+        table = np.full((n, epoch, NUM_CARD_IDS), np.inf)
+        table[g_idx, i_idx, u_idx] = self._score(swapped, keep_wild[g_idx])
+        kept = self._score(base, keep_wild)
+
+        # Best score if we take discard, never discarding its identity
+        with_top = table[rows, :, tops]
+        discard_score = np.where(hands != tops[:, None], with_top, np.inf).min(axis=1)
+
+        # Exact expected score if we draw random
+        best = np.minimum(table.min(axis=1), kept[:, None])
+        best = np.where(unseen > 0, best, 0).astype(np.int64)
+        total = unseen.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            expected = np.where(total > 0, (best * unseen).sum(axis=1) / total, np.inf)
+
+        return discard_score < expected, (table, kept)
+
+    def _greedy_discard(self, full_hands, drawn, draw_scores):
+        """
+        GreedyPlayer.discard_phase for every live game, using the scores
+        already computed in the draw phase
+        """
+        table, kept = draw_scores
+        n = len(full_hands)
+        epoch = full_hands.shape[1] - 1
+        scores = np.empty((n, epoch + 1))
+        scores[:, :epoch] = table[np.arange(n), :, drawn]
+        scores[:, epoch] = kept
+        return full_hands[np.arange(n), np.argmin(scores, axis=1)]
+
+
+def hand_counts(hands):
+    """
+    Convert rows of card ids into a count matrix
+
+    Args:
+        hands (np.ndarray): (N x cards) card ids
+
+    Returns:
+        np.ndarray: (N x 56) count of each card in each hand
+    """
+    counts = np.zeros((len(hands), NUM_CARD_IDS), dtype=np.int64)
+    rows = np.repeat(np.arange(len(hands)), hands.shape[1])
+    np.add.at(counts, (rows, hands.ravel()), 1)
+    return counts